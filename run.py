@@ -1,12 +1,15 @@
 import sys
 import traceback
-from src.meme_selector import MemeSelector
-from src.status_window import StatusWindow
 import threading
-import keyboard
+import multiprocessing
 
 def main():
     try:
+        # 在这里导入：键盘钩子子进程会重新导入本文件，不需要加载 PIL/OpenCC/Tk
+        from src.meme_selector import MemeSelector
+        from src.status_window import StatusWindow
+        import keyboard
+        
         # 创建选择器
         selector = MemeSelector()
         
@@ -17,6 +20,7 @@ def main():
         def on_switch_change(state):
             selector.set_running_state(state)
         status_window.set_callback(on_switch_change)
+        status_window.set_reload_callback(selector.reload_image_map)
         
         # 创建主窗口
         selector.root = status_window.root
@@ -24,12 +28,19 @@ def main():
         # 启动检查弹窗队列的定时器
         selector.root.after(100, selector.check_popup_queue)
         
-        # 启动键盘监听线程
-        keyboard_thread = threading.Thread(
-            target=lambda: keyboard.on_press(selector.on_key),
-            daemon=True
-        )
-        keyboard_thread.start()
+        # 状态窗口显示后再开始后台预热
+        prewarm_delay = selector.config['features'].get('prewarm', {}).get('start_delay', 2000)
+        selector.root.after(prewarm_delay, selector.start_prewarm)
+        
+        # 启动键盘监听：默认放在独立进程，避免搜索和解码拖慢全局键盘钩子
+        if selector.config['features'].get('keyboard_process', True):
+            selector.start_keyboard_process()
+        else:
+            keyboard_thread = threading.Thread(
+                target=lambda: keyboard.on_press(selector.on_key),
+                daemon=True
+            )
+            keyboard_thread.start()
         
         # 运行主循环（在主线程中）
         status_window.run()
@@ -45,4 +56,5 @@ def main():
             sys.exit(1)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
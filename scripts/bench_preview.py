@@ -0,0 +1,107 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.utils.preview import QUALITY_PRESETS, make_preview, preview_size
+
+def legacy_preview(path: Path, width: int):
+    """原来的做法：全分辨率解码后 LANCZOS 缩放"""
+    img = Image.open(path)
+    img.load()
+    decoded = img.width * img.height * len(img.getbands())
+    return img.resize(preview_size(img.size, width), Image.Resampling.LANCZOS), decoded
+
+def draft_preview(path: Path, width: int, quality: str):
+    img = Image.open(path)
+    preview = make_preview(img, width, quality)
+    decoded = img.width * img.height * len(img.getbands())
+    return preview, decoded
+
+def peak_rss():
+    """当前进程的峰值常驻内存（字节），拿不到时返回 None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    except ImportError:
+        return None
+
+def run(mode, files, width):
+    """在当前进程中跑一种模式，返回耗时、估算的解码缓冲大小和峰值内存增量"""
+    if mode == 'legacy':
+        func = lambda path: legacy_preview(path, width)
+    else:
+        func = lambda path: draft_preview(path, width, mode)
+    
+    before = peak_rss()
+    times = []
+    buffers = []
+    for path in files:
+        started = time.perf_counter()
+        preview, decoded = func(path)
+        times.append(time.perf_counter() - started)
+        # 只是按尺寸算出的解码缓冲加预览图大小，不是测量值
+        buffers.append(decoded + preview.width * preview.height * len(preview.getbands()))
+        del preview
+    after = peak_rss()
+    
+    return {
+        'times': times,
+        'buffers': buffers,
+        'peak_growth': after - before if before is not None and after is not None else None
+    }
+
+def measure(mode):
+    """每种模式在新的子进程中运行，峰值内存互不影响"""
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', mode],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+def report(name, result):
+    times = result['times']
+    buffers = result['buffers']
+    peak = result['peak_growth']
+    peak = f"{peak / 1024 / 1024:6.2f}MB" if peak is not None else '   n/a'
+    print(f"{name:<10} 平均 {statistics.mean(times) * 1000:7.2f}ms  "
+          f"中位数 {statistics.median(times) * 1000:7.2f}ms  "
+          f"总计 {sum(times):6.2f}秒  "
+          f"估算解码缓冲 平均 {statistics.mean(buffers) / 1024 / 1024:6.2f}MB "
+          f"最大 {max(buffers) / 1024 / 1024:6.2f}MB  "
+          f"实测峰值内存增量 {peak}")
+    return sum(times)
+
+def main():
+    root_dir = Path(__file__).parent.parent
+    with open(root_dir / 'config' / 'config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    
+    width = config['ui']['preview_size']['width']
+    images_dir = root_dir / config['paths'].get('images', 'images')
+    files = sorted(path for path in images_dir.iterdir() if path.is_file())
+    
+    if len(sys.argv) == 3 and sys.argv[1] == '--child':
+        print(json.dumps(run(sys.argv[2], files, width)))
+        return
+    
+    print(f"测试 {len(files)} 张图片，预览宽度 {width}px")
+    print("实测峰值内存增量：每种模式在新进程中运行，取运行前后峰值常驻内存 (ru_maxrss) 之差\n")
+    
+    baseline = report('legacy', measure('legacy'))
+    for quality in QUALITY_PRESETS:
+        total = report(quality, measure(quality))
+        print(f"{'':<10} 相对 legacy 加速 {baseline / total:.1f}x")
+
+if __name__ == '__main__':
+    main()
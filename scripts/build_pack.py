@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from src.utils.image_pack import index_path_for
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'}
+
+def build_pack(images_dir: Path, pack_path: Path):
+    """把 images 目录下的图片顺序写入一个归档文件，并生成偏移索引"""
+    files = sorted(
+        path for path in images_dir.iterdir()
+        if path.is_file() and path.suffix.lower() in IMAGE_SUFFIXES
+    )
+    
+    index = {}
+    offset = 0
+    tmp_pack = pack_path.with_name(pack_path.name + '.tmp')
+    with open(tmp_pack, 'wb') as out:
+        for path in files:
+            data = path.read_bytes()
+            out.write(data)
+            index[path.name] = [offset, len(data), path.stat().st_mtime_ns]
+            offset += len(data)
+    
+    tmp_index = tmp_pack.with_suffix('.json.tmp')
+    with open(tmp_index, 'w', encoding='utf-8') as f:
+        json.dump({'version': 1, 'files': index}, f, ensure_ascii=False)
+    
+
+    # Windows 下归档被程序映射时无法替换，需要先退出 MygoHelper 再打包
+    os.replace(tmp_pack, pack_path)
+    os.replace(tmp_index, index_path_for(pack_path))
+    return len(files), offset
+
+def main():
+    root_dir = Path(__file__).parent.parent
+    with open(root_dir / 'config' / 'config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    
+    images_dir = root_dir / config['paths'].get('images', 'images')
+    pack_path = root_dir / config['paths'].get('pack', 'data/images.pack')
+    pack_path.parent.mkdir(exist_ok=True)
+    
+    started = time.perf_counter()
+    count, size = build_pack(images_dir, pack_path)
+    print(f"已打包 {count} 张图片到 {pack_path} "
+          f"({size / 1024 / 1024:.1f}MB, 耗时 {time.perf_counter() - started:.1f}秒)")
+
+if __name__ == '__main__':
+    main()
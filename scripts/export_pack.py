@@ -0,0 +1,188 @@
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from io import BytesIO
+from pathlib import Path
+from PIL import Image
+
+FORMATS = {
+    'webp': ('WEBP', '.webp'),
+    'jpeg': ('JPEG', '.jpg'),
+    'png': ('PNG', '.png'),
+}
+
+def fit_size(size, target):
+    """等比例缩放到最长边等于 target（贴纸平台通常要求一边正好是 512）"""
+    width, height = size
+    scale = target / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def encode(img, fmt, quality=None, method=4):
+    output = BytesIO()
+    options = {'optimize': True} if fmt == 'PNG' else {'quality': quality}
+    if fmt == 'WEBP':
+        options['method'] = method
+    img.save(output, fmt, **options)
+    return output.getvalue()
+
+def export_image(job):
+    """子进程中执行：缩放并二分查找满足大小限制的最高编码质量"""
+    src, dst, size, fmt, max_bytes, method = job
+    img = Image.open(src)
+    img.draft('RGB', fit_size(img.size, size))
+    img = img.convert('RGB' if fmt == 'JPEG' else 'RGBA')
+    img = img.resize(fit_size(img.size, size), Image.Resampling.LANCZOS)
+    
+    if fmt == 'PNG':
+        data = encode(img, fmt)
+        quality = None
+    else:
+        # 最高质量已经满足限制时不需要查找，否则在 [1, 99] 中找满足限制的最大质量
+        data, quality = encode(img, fmt, 100, method), 100
+        low, high = 1, 99
+        if len(data) <= max_bytes:
+            low = high + 1
+        else:
+            data, quality = None, None
+        while low <= high:
+            mid = (low + high) // 2
+            candidate = encode(img, fmt, mid, method)
+            if len(candidate) <= max_bytes:
+                data, quality = candidate, mid
+                low = mid + 1
+            else:
+                high = mid - 1
+        if data is None:
+            data, quality = encode(img, fmt, 1, method), 1
+    
+    Path(dst).write_bytes(data)
+    return {'bytes': len(data), 'quality': quality, 'over_budget': len(data) > max_bytes}
+
+def file_hash(path, settings):
+    """输入文件内容和导出参数一起决定输出，任何一个变化都需要重新导出"""
+    digest = hashlib.sha1(settings.encode('utf-8'))
+    digest.update(Path(path).read_bytes())
+    return digest.hexdigest()
+
+def output_names(file_names, suffix):
+    """给每个源文件分配输出文件名
+
+    a.jpg 和 a.png 换成同一种格式后主干相同，改名为 a_jpg / a_png，避免互相覆盖。
+    按小写比较，Windows 下大小写不同的文件名也算冲突。
+    """
+    stems = Counter(Path(name).stem.lower() for name in file_names)
+    used = set()
+    names = {}
+    for file_name in file_names:
+        path = Path(file_name)
+        stem = path.stem
+        if stems[stem.lower()] > 1:
+            stem = f"{stem}_{path.suffix.lstrip('.').lower()}"
+        
+        name = stem + suffix
+        counter = 2
+        while name.lower() in used:
+            name = f"{stem}_{counter}{suffix}"
+            counter += 1
+        used.add(name.lower())
+        names[file_name] = name
+    return names
+
+def main():
+    root_dir = Path(__file__).parent.parent
+    parser = argparse.ArgumentParser(description='导出固定尺寸和格式的贴纸包')
+    parser.add_argument('--size', type=int, default=512, help='输出最长边像素')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='webp')
+    parser.add_argument('--max-kb', type=int, default=512, help='单张图片大小上限 (KB)')
+    parser.add_argument('--output', type=Path, default=None, help='输出目录，默认 exports/<格式>_<尺寸>')
+    parser.add_argument('--method', type=int, default=4, choices=range(7), help='WebP 压缩力度，越大越慢越小')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--force', action='store_true', help='忽略清单，全部重新导出')
+    args = parser.parse_args()
+    
+    fmt, suffix = FORMATS[args.format]
+    max_bytes = args.max_kb * 1024
+    output_dir = args.output or root_dir / 'exports' / f"{args.format}_{args.size}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / 'manifest.json'
+    manifest = {}
+    if manifest_path.exists() and not args.force:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    
+    with open(root_dir / 'config' / 'config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    with open(root_dir / 'data' / 'image_map.json', 'r', encoding='utf-8') as f:
+        image_map = json.load(f)
+    
+
+    settings = f"{fmt}:{args.size}:{max_bytes}:{args.method}"
+    images_dir = root_dir / config['paths'].get('images', 'images')
+    jobs = {}
+    missing = skipped = 0
+    outputs = output_names(list(dict.fromkeys(img['file_name'] for img in image_map)), suffix)
+    for file_name, output_name in outputs.items():
+        src = images_dir / file_name
+        if not src.exists():
+            missing += 1
+            continue
+        dst = output_dir / output_name
+        digest = file_hash(src, settings)
+        entry = manifest.get(file_name)
+        if entry and entry['hash'] == digest and entry.get('output') == output_name and dst.exists():
+            skipped += 1
+            continue
+        jobs[file_name] = (digest, (str(src), str(dst), args.size, fmt, max_bytes, args.method))
+    
+    print(f"共 {len(jobs) + skipped} 张图片：需要导出 {len(jobs)} 张，未变化跳过 {skipped} 张，"
+          f"缺少源文件 {missing} 张")
+    
+
+    started = time.perf_counter()
+    failed = over_budget = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(export_image, job): (file_name, digest)
+            for file_name, (digest, job) in jobs.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            file_name, digest = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"导出失败 {file_name}: {e}")
+                continue
+            if result['over_budget']:
+                over_budget += 1
+                if fmt == 'PNG':
+                    print(f"警告: {file_name} PNG 无损输出超过 {args.max_kb}KB "
+                          f"({result['bytes'] / 1024:.0f}KB)，PNG 无法降低质量，可改用 webp 或减小 --size")
+                else:
+                    print(f"警告: {file_name} 最低质量仍超过 {args.max_kb}KB ({result['bytes'] / 1024:.0f}KB)")
+            manifest[file_name] = {
+                'hash': digest,
+                'output': outputs[file_name],
+                'bytes': result['bytes'],
+                'quality': result['quality']
+            }
+    elapsed = time.perf_counter() - started
+    
+
+    tmp_path = manifest_path.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, manifest_path)
+    
+    done = len(jobs) - failed
+    rate = done / elapsed if elapsed > 0 else 0
+    print(f"\n导出 {done} 张，失败 {failed} 张，超出大小限制 {over_budget} 张")
+    print(f"耗时 {elapsed:.1f}秒，吞吐 {rate:.1f} 张/秒 ({args.workers} 个进程)")
+    print(f"输出目录: {output_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+"""长时间运行的内存/句柄泄漏测试
+
+用真实的 Tk 和 MemeSelector 连续执行大量搜索、翻页、切换网格、发送和隐藏弹窗，
+并定期重新加载图片映射（整体替换索引）、模拟空闲让后台预热线程重新跑一遍。
+定期记录 RSS、tracemalloc、Tk 图片数量、线程数和预览/缩略图缓存占用，
+增长超过阈值或缓存超过配置上限时以非零状态退出。
+
+键盘、剪贴板和光标相关的 Windows 接口会被替换为空实现，不会真的发送按键。
+Linux 下可以配合虚拟显示运行：
+    xvfb-run python scripts/soak_test.py --iterations 20000
+没有显示器时用 --fake-tk 换成纯 Python 的假 Tk，Tk 图片数量由假 PhotoImage 统计：
+    python scripts/soak_test.py --fake-tk --iterations 20000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# 报告输出，程序本身的日志在测试过程中会被丢弃
+REPORT = sys.stdout
+
+def install_stubs():
+    """替换会影响真实桌面的模块：不发送按键、不写剪贴板"""
+    keyboard = types.ModuleType('keyboard')
+    keyboard.press_and_release = lambda *args, **kwargs: None
+    keyboard.send = lambda *args, **kwargs: None
+    keyboard.on_press = lambda *args, **kwargs: None
+    
+    win32gui = types.ModuleType('win32gui')
+    win32gui.GetCursorPos = lambda: (200, 600)
+    
+    win32con = types.ModuleType('win32con')
+    win32con.CF_DIB = 8
+    win32con.CF_UNICODETEXT = 13
+    win32con.CF_HDROP = 15
+    
+    win32clipboard = types.ModuleType('win32clipboard')
+    for name in ('OpenClipboard', 'EmptyClipboard', 'SetClipboardData', 'CloseClipboard',
+                 'GetClipboardData', 'IsClipboardFormatAvailable'):
+        setattr(win32clipboard, name, lambda *args, **kwargs: None)
+    
+    for module in (keyboard, win32gui, win32con, win32clipboard):
+        sys.modules[module.__name__] = module
+
+def install_fake_tk():
+    """用纯 Python 的假 tkinter 和 ImageTk 代替真实窗口，不需要显示器
+
+    只实现 MemeSelector 用到的控件方法。假 PhotoImage 创建时登记名称、被回收时注销，
+    「image names」返回仍然存活的图片，和真实 Tk 的计数口径一致；控件引用已经
+    释放的图片时抛出 TclError。after 注册的回调在 update() 时执行。
+    """
+    import PIL
+    
+    images = set()
+    pending = {}
+    counter = itertools.count(1)
+    
+    class TclError(Exception):
+        pass
+    
+    class Interp:
+        def call(self, *args):
+            if args[:2] == ('image', 'names'):
+                return tuple(images)
+            return ''
+    
+    class Widget:
+        def __init__(self, master=None, **options):
+            self.tk = Interp()
+            self.options = {}
+            self.configure(**options)
+        
+        def configure(self, **options):
+            image = options.get('image')
+            if image not in (None, '') and str(image) not in images:
+                raise TclError(f'image "{image}" doesn\'t exist')
+            self.options.update(options)
+        
+        config = configure
+        
+        def cget(self, key):
+            return self.options.get(key, '')
+        
+        def after(self, delay, callback, *args):
+            job = f'after#{next(counter)}'
+            pending[job] = (callback, args)
+            return job
+        
+        def after_cancel(self, job):
+            pending.pop(job, None)
+        
+        def update(self):
+            # 只执行本次调用之前注册的回调，动画自己重新注册的留到下一次
+            for job in list(pending):
+                callback, args = pending.pop(job, (None, ()))
+                if callback is not None:
+                    callback(*args)
+        
+        def winfo_exists(self):
+            return True
+        
+        def winfo_reqwidth(self):
+            return 400
+        
+        def winfo_reqheight(self):
+            return 400
+        
+        def winfo_screenwidth(self):
+            return 1920
+        
+        def winfo_screenheight(self):
+            return 1080
+        
+        def winfo_x(self):
+            return 0
+        
+        def winfo_y(self):
+            return 0
+    
+    for name in ('pack', 'pack_forget', 'pack_propagate', 'bind', 'withdraw', 'deiconify',
+                 'lift', 'overrideredirect', 'attributes', 'geometry', 'protocol',
+                 'update_idletasks', 'destroy', 'title', 'resizable'):
+        setattr(Widget, name, lambda self, *args, **kwargs: None)
+    
+    class PhotoImage:
+        def __init__(self, image=None, size=None, **options):
+            self.name = f'pyimage{next(counter)}'
+            self.size = image.size if image is not None else size
+            images.add(self.name)
+        
+        def paste(self, image, box=None):
+            if image.size != self.size:
+                raise ValueError('images do not match')
+        
+        def width(self):
+            return self.size[0]
+        
+        def height(self):
+            return self.size[1]
+        
+        def __str__(self):
+            return self.name
+        
+        def __del__(self):
+            images.discard(self.name)
+    
+    tkinter = types.ModuleType('tkinter')
+    tkinter.TclError = TclError
+    tkinter.Tk = tkinter.Toplevel = tkinter.Frame = tkinter.Label = Widget
+    for name in ('X', 'Y', 'BOTH', 'LEFT', 'RIGHT', 'TOP', 'BOTTOM', 'W', 'E', 'NORMAL', 'DISABLED'):
+        setattr(tkinter, name, name.lower())
+    
+    messagebox = types.ModuleType('tkinter.messagebox')
+    for name in ('showinfo', 'showwarning', 'showerror'):
+        setattr(messagebox, name, lambda *args, **kwargs: None)
+    messagebox.askokcancel = lambda *args, **kwargs: True
+    tkinter.messagebox = messagebox
+    
+    image_tk = types.ModuleType('PIL.ImageTk')
+    image_tk.PhotoImage = PhotoImage
+    PIL.ImageTk = image_tk
+    
+    for module in (tkinter, messagebox, image_tk):
+        sys.modules[module.__name__] = module
+
+def rss_bytes():
+    """当前进程常驻内存，拿不到时返回 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class Sampler:
+    def __init__(self, root, selector):
+        self.root = root
+        self.selector = selector
+        self.samples = []
+
+    def sample(self, iteration):
+        traced, _ = tracemalloc.get_traced_memory()
+        sample = {
+            'iteration': iteration,
+            'rss': rss_bytes(),
+            'traced': traced,
+            'tk_images': len(self.root.tk.call('image', 'names')),
+            'threads': threading.active_count(),
+            'preview_cache': self.selector.preview_cache.current_bytes,
+            'thumbnail_cache': self.selector.thumbnail_cache.current_bytes
+        }
+        self.samples.append(sample)
+        rss = f"{sample['rss'] / 1024 / 1024:8.1f}MB" if sample['rss'] else '     n/a'
+        caches = (sample['preview_cache'] + sample['thumbnail_cache']) / 1024 / 1024
+        print(f"[{iteration:>7}] RSS {rss}  Python {traced / 1024 / 1024:7.1f}MB  "
+              f"Tk图片 {sample['tk_images']:4d}  线程 {sample['threads']:3d}  "
+              f"缓存 {caches:6.1f}MB", file=REPORT)
+        return sample
+
+def drain_popup_queue(selector):
+    """代替 check_popup_queue 处理弹窗请求（不重复注册 after 定时器）"""
+    while not selector.popup_queue.empty():
+        memes = selector.popup_queue.get_nowait()
+        if memes is None:
+            selector._hide_popup()
+        else:
+            selector._show_popup(memes)
+
+def restart_prewarm(selector, idle_seconds):
+    """结束上一轮预热线程，重新启动预热，然后空闲一段时间让它真正解码图片"""
+    if selector.prewarmer is not None:
+        selector.prewarmer.stop()
+        selector.prewarmer.thread.join()
+        selector.prewarmer = None
+    selector.start_prewarm()
+    time.sleep(idle_seconds)
+
+def build_queries(image_map, count, rng):
+    """从表情包名称中截取片段作为查询，并混入拼音、筛选和不存在的词"""
+    queries = []
+    names = [img['name'] for img in image_map] or ['测试']
+    for _ in range(count):
+        name = rng.choice(names)
+        start = rng.randrange(len(name))
+        queries.append(('text', name[start:start + rng.randint(1, 6)]))
+    queries += [('text', '爱音:'), ('text', 'ep11'), ('text', '完全不存在的句子')]
+    queries += [('pinyin', 'zhenbuganxiangxin'), ('pinyin', 'aiyin'), ('pinyin', 'qwerty')]
+    return queries
+
+def main():
+    parser = argparse.ArgumentParser(description='MemeSelector 长时间运行泄漏测试')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--sample-every', type=int, default=1000)
+    parser.add_argument('--warmup', type=float, default=0.25, help='前多少比例的迭代用于填满缓存，不计入增长')
+    parser.add_argument('--send-every', type=int, default=50)
+    parser.add_argument('--reload-every', type=int, default=1000, help='每隔多少次迭代重新加载图片映射，0 表示不重新加载')
+    parser.add_argument('--prewarm-every', type=int, default=2000, help='每隔多少次迭代模拟一次空闲并重新预热，0 表示不预热')
+    parser.add_argument('--max-rss-growth-mb', type=float, default=50)
+    parser.add_argument('--max-traced-growth-mb', type=float, default=20)
+    parser.add_argument('--max-tk-image-growth', type=int, default=5)
+    parser.add_argument('--max-thread-growth', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='保留程序自身的日志输出')
+    parser.add_argument('--fake-tk', action='store_true', help='使用假 Tk，无需显示器（不测 Tk 本身的泄漏）')
+    args = parser.parse_args()
+    
+    install_stubs()
+    if args.fake_tk:
+        install_fake_tk()
+    import tkinter as tk
+    from src.meme_selector import MemeSelector
+    from src.utils.usage_stats import UsageStats
+    
+    tracemalloc.start(10)
+    rng = random.Random(args.seed)
+    
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        print(f"无法创建 Tk 窗口（Linux 下请使用 xvfb-run 运行）: {e}", file=REPORT)
+        sys.exit(2)
+    root.withdraw()
+    if not args.verbose:
+        sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+    selector = MemeSelector()
+    selector.root = root
+    # 发送记录写到临时目录，避免污染真实的使用统计
+    selector.usage_stats = UsageStats(Path(tempfile.mkdtemp()))
+    
+    queries = build_queries(selector.image_map, 500, rng)
+    sampler = Sampler(root, selector)
+    prewarm_config = selector.config['features'].get('prewarm', {})
+    idle_seconds = prewarm_config.get('idle_delay', 1.0) + 0.5
+    reloads = prewarms = 0
+    warmup_iteration = int(args.iterations * args.warmup)
+    baseline = None
+    baseline_snapshot = None
+    started = time.perf_counter()
+    
+    for iteration in range(1, args.iterations + 1):
+        kind, query = rng.choice(queries)
+        if kind == 'pinyin':
+            selector.search_pinyin(query)
+        else:
+            selector.search_memes(query)
+        drain_popup_queue(selector)
+        
+        if selector.popup_memes:
+            for _ in range(rng.randint(0, 3)):
+                selector._change_popup_image(rng.choice((-1, 1)))
+            if rng.random() < 0.2:
+                selector._toggle_popup_mode()
+            if iteration % args.send_every == 0:
+                selector._send_current_meme()
+            elif rng.random() < 0.5:
+                selector.hide_popup()
+                drain_popup_queue(selector)
+        root.update()
+        
+        if args.reload_every and iteration % args.reload_every == 0:
+            selector.reload_image_map()
+            reloads += 1
+        if args.prewarm_every and iteration % args.prewarm_every == 0:
+            restart_prewarm(selector, idle_seconds)
+            prewarms += 1
+        
+        if iteration == warmup_iteration or (warmup_iteration == 0 and iteration == 1):
+            baseline = sampler.sample(iteration)
+            baseline_snapshot = tracemalloc.take_snapshot()
+        elif iteration % args.sample_every == 0 and iteration != args.iterations:
+            sampler.sample(iteration)
+    
+    if selector.prewarmer is not None:
+        selector.prewarmer.stop()
+        selector.prewarmer.thread.join()
+    selector._hide_popup()
+    root.update()
+    final = sampler.sample(args.iterations)
+    elapsed = time.perf_counter() - started
+    print(f"\n完成 {args.iterations} 次搜索，耗时 {elapsed:.1f}秒 "
+          f"({args.iterations / elapsed:.0f} 次/秒)，重新加载 {reloads} 次，预热 {prewarms} 次", file=REPORT)
+    
+    print("\ntracemalloc 增长最多的分配位置：", file=REPORT)
+    for stat in tracemalloc.take_snapshot().compare_to(baseline_snapshot, 'lineno')[:10]:
+        print(f"  {stat}", file=REPORT)
+    
+    failures = []
+    if baseline['rss'] and final['rss']:
+        growth = (final['rss'] - baseline['rss']) / 1024 / 1024
+        if growth > args.max_rss_growth_mb:
+            failures.append(f"RSS 增长 {growth:.1f}MB > {args.max_rss_growth_mb}MB")
+    growth = (final['traced'] - baseline['traced']) / 1024 / 1024
+    if growth > args.max_traced_growth_mb:
+        failures.append(f"Python 内存增长 {growth:.1f}MB > {args.max_traced_growth_mb}MB")
+    growth = final['tk_images'] - baseline['tk_images']
+    if growth > args.max_tk_image_growth:
+        failures.append(f"Tk 图片增加 {growth} 个 > {args.max_tk_image_growth}")
+    growth = final['threads'] - baseline['threads']
+    if growth > args.max_thread_growth:
+        failures.append(f"线程增加 {growth} 个 > {args.max_thread_growth}")
+    limit = selector.preview_cache.max_bytes
+    peak = max(sample['preview_cache'] for sample in sampler.samples)
+    if limit and peak > limit:
+        failures.append(f"预览缓存 {peak / 1024 / 1024:.1f}MB 超过上限 {limit / 1024 / 1024:.1f}MB")
+    
+    root.destroy()
+    if failures:
+        print("\n✗ 泄漏检查未通过：", file=REPORT)
+        for failure in failures:
+            print(f"  - {failure}", file=REPORT)
+        sys.exit(1)
+    print("\n✓ 泄漏检查通过", file=REPORT)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""独立进程中的全局键盘钩子
+
+这个模块只依赖 keyboard，不导入 PIL、OpenCC 或 Tk。钩子进程只负责维护拼音
+缓冲区，把搜索动作通过队列发给主进程，主进程里的搜索和解码再慢也不会阻塞
+系统的低级键盘钩子。
+"""
+import multiprocessing
+import keyboard
+from .utils.key_buffer import KeyBuffer, LatencyProbe
+
+def run_hook(queue, report_every: int = 200, parent_poll: float = 1.0):
+    """子进程入口：注册钩子并一直运行到主进程退出
+
+    daemon 子进程只在主进程正常退出时被清理。主进程崩溃或被任务管理器结束时，
+    这里每隔 parent_poll 秒检查一次，发现主进程不在了就卸载全局钩子并退出。
+    """
+    buffer = KeyBuffer()
+    probe = LatencyProbe(report_every)
+    
+    def on_press(event):
+        action = buffer.feed(event.name)
+        if action is not None:
+            queue.put(action)
+        summary = probe.record(event.time)
+        if summary is not None:
+            queue.put(('latency', summary))
+    
+    keyboard.on_press(on_press)
+    parent = multiprocessing.parent_process()
+    if parent is None:
+        keyboard.wait()
+        return
+    
+    # 主进程退出时 sentinel 变为就绪，join 会提前返回
+    while parent.is_alive():
+        parent.join(parent_poll)
+    keyboard.unhook_all()
@@ -8,13 +8,35 @@ import win32gui
 import win32con
 import win32clipboard
 import time
+import struct
+import multiprocessing
 from pathlib import Path
 from .utils.debouncer import Debouncer
+from .utils.lru_cache import LRUCache
+from .utils.usage_stats import UsageStats
+from .utils.prewarm import Prewarmer
+from .utils.pinyin_index import PinyinIndex
+from .utils.ime import ime_native_mode
+from .utils.ngram_index import NgramIndex
+from .utils.fuzzy import FuzzyMatcher
+from .utils.facets import FacetIndex
+from .utils.tfidf_index import TfidfIndex
+from .utils.image_pack import ImagePack
+from .utils.preview import make_preview
+from .utils.animation import FrameStream, is_animated, may_be_animated
+from .utils.key_buffer import KeyBuffer, LatencyProbe
+from .keyboard_hook import run_hook
+from .utils.thumbnails import (
+    image_nbytes, make_thumbnail, compose_sprite, cell_at, highlight_cell
+)
 from threading import Thread, Lock
-from queue import Queue
+from queue import Queue, Empty
 import opencc
 
 class MemeSelector:
+    KEY_PROCESS_POLL = 1.0     # 检查钩子子进程是否存活的间隔（秒）
+    KEY_PROCESS_RESTARTS = 3   # 超过这个次数后改回进程内钩子
+
     def __init__(self):
         try:
             print("\n=== 初始化 MemeSelector ===")
@@ -28,6 +50,7 @@ class MemeSelector:
             
 
             self.images_path = required_dirs['图片目录']
+            self.image_pack = None
             
             for name, path in required_dirs.items():
                 if not path.exists():
@@ -94,15 +117,64 @@ class MemeSelector:
                 raise
 
 
-            self.image_map = self.load_image_map()
+            self.index_lock = Lock()
+            self.map_version = 0
+            self._swap_indexes(self._build_indexes(self.load_image_map()))
             print(f"✓ 加载了 {len(self.image_map)} 个图片映射")
             
 
-            self.pinyin_buffer = ""
+            pack_path = self.config.get('paths', {}).get('pack')
+            if pack_path:
+                self.image_pack = ImagePack.open(
+                    Path(__file__).parent.parent / pack_path,
+                    images_dir=self.images_path
+                )
+            
+
+            cache_config = self.config['features']['search'].get('result_cache', {})
+            self.result_cache = LRUCache(max_items=cache_config.get('max_items', 256))
+            self.query_cache = LRUCache(max_items=cache_config.get('max_items', 256))
+            self.result_cache_top_k = cache_config.get('top_k', 50)
+            
+
+            usage_config = self.config['features'].get('usage', {})
+            self.usage_stats = None
+            if usage_config.get('enabled', True):
+                self.usage_stats = UsageStats(
+                    required_dirs['数据目录'],
+                    half_life_days=usage_config.get('half_life_days', 14),
+                    compact_every=usage_config.get('compact_every', 200)
+                )
+            
+
+            self.key_buffer = KeyBuffer()
+            self.latency_probe = LatencyProbe()
+            self.key_queue = None
+            self.key_process = None
             self.current_window = None
+            self.popup_widgets = {}
+            self.popup_memes = []
+            self.popup_index = 0
+            self.popup_mode = 'single'
+            self.grid_sprite = None
+            self.grid_photo = None
+            self.animation = None
+            self.animation_job = None
+            self.animation_photo = None
+            self.animated_urls = {}
             self.is_running = True
             self.popup_queue = Queue()
             self.photo_references = {}
+            self.thumbnail_cache = LRUCache(
+                max_items=self._grid_config().get('cache_size', 500),
+                sizeof=image_nbytes
+            )
+            self.preview_cache = LRUCache(
+                max_items=self.config['ui'].get('preview_cache', {}).get('max_items', 200),
+                max_bytes=self.config['ui'].get('preview_cache', {}).get('max_mb', 64) * 1024 * 1024,
+                sizeof=image_nbytes
+            )
+            self.prewarmer = None
             
 
             self.root = None 
@@ -121,11 +193,14 @@ class MemeSelector:
             raise
 
     def check_popup_queue(self):
-        """检查是否需要创建弹窗"""
+        """检查是否需要显示或隐藏弹窗"""
         try:
             while not self.popup_queue.empty():
                 memes = self.popup_queue.get_nowait()
-                self._create_popup(memes)
+                if memes is None:
+                    self._hide_popup()
+                else:
+                    self._show_popup(memes)
         except Exception as e:
             print(f"检查弹窗队列错误: {e}")
         finally:
@@ -135,287 +210,506 @@ class MemeSelector:
         """将弹窗请求添加到队列"""
         self.popup_queue.put(memes)
 
-    def _create_popup(self, memes):
-        """实际创建弹窗的方法"""
+    def hide_popup(self):
+        """将隐藏弹窗请求添加到队列（可在非主线程调用）"""
+        self.popup_queue.put(None)
+
+    def _build_popup(self):
+        """创建常驻弹窗，只在第一次显示时调用，之后通过 withdraw/deiconify 切换"""
+        style = self.config['ui']['window_style']
+
+        window = tk.Toplevel(self.root)
+        window.withdraw()
+        window.overrideredirect(True)
+        window.attributes('-topmost', True)
+        window.attributes('-alpha', style['opacity'])
+        
+
+        main_frame = tk.Frame(window, bg=style['bg_color'])
+        main_frame.pack(expand=True, fill=tk.BOTH)
+        
+
+        title_frame = tk.Frame(main_frame, bg=style['title_bg'], height=40)
+        title_frame.pack(fill=tk.X)
+        title_frame.pack_propagate(False)
+        
+
+        title_label = tk.Label(
+            title_frame,
+            text="表情包选择器",
+            bg=style['title_bg'],
+            fg=style['text_color'],
+            font=('Microsoft YaHei UI', 11)
+        )
+        title_label.pack(side=tk.LEFT, padx=15)
+        
+
+        close_btn = tk.Label(
+            title_frame,
+            text='×',
+            bg=style['title_bg'],
+            fg=style['text_color'],
+            font=('Arial', 18),
+            cursor='hand2'
+        )
+        close_btn.pack(side=tk.RIGHT, padx=15)
+        
+
+        content_frame = tk.Frame(
+            main_frame,
+            bg=style['bg_color'],
+            padx=self.config['ui']['layout']['padding'],
+            pady=self.config['ui']['layout']['padding']
+        )
+        content_frame.pack(expand=True, fill=tk.BOTH)
+        
+
+        nav_frame = tk.Frame(content_frame, bg=style['bg_color'])
+        nav_frame.pack(fill=tk.X, pady=(0, 10))
+        
+
+        button_style = {
+            'bg': style['button_bg'],
+            'fg': style['text_color'],
+            'font': ('Microsoft YaHei UI', 14),
+            'width': 3,
+            'cursor': 'hand2',
+            'relief': 'flat'
+        }
+        
+
+        prev_btn = tk.Label(nav_frame, text="◀", **button_style)
+        prev_btn.pack(side=tk.LEFT)
+        prev_btn.bind('<Button-1>', lambda e: self._change_popup_image(-1))
+        prev_btn.bind('<Enter>', lambda e: prev_btn.configure(bg=style['button_hover']))
+        prev_btn.bind('<Leave>', lambda e: prev_btn.configure(bg=style['button_bg']))
+        
+
+        next_btn = tk.Label(nav_frame, text="▶", **button_style)
+        next_btn.pack(side=tk.RIGHT)
+        next_btn.bind('<Button-1>', lambda e: self._change_popup_image(1))
+        next_btn.bind('<Enter>', lambda e: next_btn.configure(bg=style['button_hover']))
+        next_btn.bind('<Leave>', lambda e: next_btn.configure(bg=style['button_bg']))
+        
+
+        image_frame = tk.Frame(content_frame, bg=style['bg_color'])
+        image_frame.pack(expand=True, fill=tk.BOTH)
+        
+
+        image_label = tk.Label(image_frame, bg=style['bg_color'], cursor='hand2')
+        image_label.pack(expand=True)
+        image_label.bind('<Button-1>', lambda e: self._send_current_meme())
+        
+
+        grid_label = tk.Label(
+            image_frame,
+            bg=style['bg_color'],
+            cursor='hand2',
+            bd=0,
+            highlightthickness=0,
+            padx=0,
+            pady=0
+        )
+        grid_label.bind('<Button-1>', self._on_grid_click)
+        grid_label.bind('<Motion>', self._on_grid_motion)
+        
+
+        info_frame = tk.Frame(content_frame, bg=style['bg_color'])
+        info_frame.pack(fill=tk.X, pady=(10, 0))
+        
+
+        name_label = tk.Label(
+            info_frame,
+            bg=style['bg_color'],
+            fg=style['text_color'],
+            font=('Microsoft YaHei UI', 10)
+        )
+        name_label.pack()
+        
+
+        score_label = tk.Label(
+            info_frame,
+            bg=style['bg_color'],
+            fg=style['accent_color'],
+            font=('Microsoft YaHei UI', 9)
+        )
+        score_label.pack()
+        
+
+        window.bind('<Left>', lambda e: self._change_popup_image(-1))
+        window.bind('<Right>', lambda e: self._change_popup_image(1))
+        window.bind('<Return>', lambda e: self._send_current_meme())
+        window.bind('<Tab>', lambda e: self._toggle_popup_mode())
+        window.bind('<Up>', lambda e: self._move_grid_row(-1))
+        window.bind('<Down>', lambda e: self._move_grid_row(1))
+        window.bind('<Escape>', lambda e: self._hide_popup())
+        window.protocol("WM_DELETE_WINDOW", self._hide_popup)
+        
+
+        close_btn.bind('<Button-1>', lambda e: self._hide_popup())
+        close_btn.bind('<Enter>', lambda e: close_btn.configure(fg='#ff4444'))
+        close_btn.bind('<Leave>', lambda e: close_btn.configure(fg=style['text_color']))
+        
+
+        def start_move(event):
+            window.x = event.x
+            window.y = event.y
+        
+        def on_motion(event):
+            x = window.winfo_x() + event.x - window.x
+            y = window.winfo_y() + event.y - window.y
+            window.geometry(f"+{x}+{y}")
+        
+        title_frame.bind('<Button-1>', start_move)
+        title_frame.bind('<B1-Motion>', on_motion)
+        title_label.bind('<Button-1>', start_move)
+        title_label.bind('<B1-Motion>', on_motion)
+        
+
+        self.current_window = window
+        self.popup_widgets = {
+            'image': image_label,
+            'grid': grid_label,
+            'name': name_label,
+            'score': score_label,
+            'prev': prev_btn,
+            'next': next_btn
+        }
+
+    def _show_popup(self, memes):
+        """显示弹窗：只替换图片和文字，不重建窗口"""
         try:
-
-            if self.current_window and self.current_window.winfo_exists():
-                self.current_window.destroy()
-            
-
-            self.photo_references.clear()
-            
-
-            for meme in memes['urls']:
-                try:
-                    img = Image.open(meme['url'])
-                    aspect_ratio = img.width / img.height
-                    preview_width = self.config['ui']['preview_size']['width']
-                    preview_height = int(preview_width / aspect_ratio)
-                    
-                    img = img.resize(
-                        (preview_width, preview_height),
-                        Image.Resampling.LANCZOS
-                    )
-                    photo = ImageTk.PhotoImage(img)
-                    self.photo_references[meme['url']] = photo
-                except Exception as e:
-                    print(f"预加载图片失败 {meme['url']}: {e}")
+            if self.prewarmer:
+                self.prewarmer.notify_activity()
+            if self.current_window is None or not self.current_window.winfo_exists():
+                self._build_popup()
             
 
-            window = tk.Toplevel(self.root)
-            self.current_window = window
-            window.overrideredirect(True)
-            window.attributes('-topmost', True)
-            window.attributes('-alpha', self.config['ui']['window_style']['opacity'])
+            self._release_popup_images()
+            self.popup_memes = memes['urls']
+            self.popup_index = 0
+            grid_mode = self._grid_config().get('enabled', False) and len(self.popup_memes) > 1
+            self._set_popup_mode('grid' if grid_mode else 'single')
+            self._update_popup_image()
             
 
-            main_frame = tk.Frame(
-                window,
-                bg=self.config['ui']['window_style']['bg_color']
-            )
-            main_frame.pack(expand=True, fill=tk.BOTH)
-            
-
-            title_frame = tk.Frame(
-                main_frame,
-                bg=self.config['ui']['window_style']['title_bg'],
-                height=40
-            )
-            title_frame.pack(fill=tk.X)
-            title_frame.pack_propagate(False)
-            
-
-            title_label = tk.Label(
-                title_frame,
-                text="表情包选择器",
-                bg=self.config['ui']['window_style']['title_bg'],
-                fg=self.config['ui']['window_style']['text_color'],
-                font=('Microsoft YaHei UI', 11)
-            )
-            title_label.pack(side=tk.LEFT, padx=15)
-            
-
-            close_btn = tk.Label(
-                title_frame,
-                text='×',
-                bg=self.config['ui']['window_style']['title_bg'],
-                fg=self.config['ui']['window_style']['text_color'],
-                font=('Arial', 18),
-                cursor='hand2'
-            )
-            close_btn.pack(side=tk.RIGHT, padx=15)
-            
-
-            content_frame = tk.Frame(
-                main_frame,
-                bg=self.config['ui']['window_style']['bg_color'],
-                padx=self.config['ui']['layout']['padding'],
-                pady=self.config['ui']['layout']['padding']
-            )
-            content_frame.pack(expand=True, fill=tk.BOTH)
-            
-
-            current_index = tk.IntVar(value=0)
-            total_images = len(memes['urls'])
-            
-            def change_image(delta):
-                """切换图片"""
-                new_index = current_index.get() + delta
-                if 0 <= new_index < total_images:
-                    current_index.set(new_index)
-                    update_image(new_index)
-            
-
-            nav_frame = tk.Frame(
-                content_frame,
-                bg=self.config['ui']['window_style']['bg_color']
-            )
-            nav_frame.pack(fill=tk.X, pady=(0, 10))
-            
-
-            button_style = {
-                'bg': self.config['ui']['window_style']['button_bg'],
-                'fg': self.config['ui']['window_style']['text_color'],
-                'font': ('Microsoft YaHei UI', 14),
-                'width': 3,
-                'cursor': 'hand2',
-                'relief': 'flat'
-            }
-            
-
-            prev_btn = tk.Label(
-                nav_frame,
-                text="◀",
-                **button_style
-            )
-            prev_btn.pack(side=tk.LEFT)
-            
-
-            prev_btn.bind('<Button-1>', lambda e: change_image(-1))
-            prev_btn.bind('<Enter>', lambda e: prev_btn.configure(bg=self.config['ui']['window_style']['button_hover']))
-            prev_btn.bind('<Leave>', lambda e: prev_btn.configure(bg=self.config['ui']['window_style']['button_bg']))
-            
-
-            next_btn = tk.Label(
-                nav_frame,
-                text="▶",
-                **button_style
-            )
-            next_btn.pack(side=tk.RIGHT)
-            
-
-            next_btn.bind('<Button-1>', lambda e: change_image(1))
-            next_btn.bind('<Enter>', lambda e: next_btn.configure(bg=self.config['ui']['window_style']['button_hover']))
-            next_btn.bind('<Leave>', lambda e: next_btn.configure(bg=self.config['ui']['window_style']['button_bg']))
-            
-
-            image_frame = tk.Frame(
-                content_frame,
-                bg=self.config['ui']['window_style']['bg_color']
-            )
-            image_frame.pack(expand=True, fill=tk.BOTH)
-            
-
-            image_label = tk.Label(
-                image_frame,
-                bg=self.config['ui']['window_style']['bg_color'],
-                cursor='hand2'
-            )
-            image_label.pack(expand=True)
-            
-
-            info_frame = tk.Frame(
-                content_frame,
-                bg=self.config['ui']['window_style']['bg_color']
-            )
-            info_frame.pack(fill=tk.X, pady=(10, 0))
+            self._position_popup()
+            self.current_window.deiconify()
+            self.current_window.lift()
             
+        except Exception as e:
+            print(f"显示弹窗失败: {e}")
+            import traceback
+            traceback.print_exc()
 
-            name_label = tk.Label(
-                info_frame,
-                bg=self.config['ui']['window_style']['bg_color'],
-                fg=self.config['ui']['window_style']['text_color'],
-                font=('Microsoft YaHei UI', 10)
+    def _hide_popup(self):
+        """隐藏弹窗并释放本次结果的预览图"""
+        if self.current_window is None or not self.current_window.winfo_exists():
+            return
+        self.current_window.withdraw()
+        self._release_popup_images()
+        self.popup_memes = []
+
+    def _release_popup_images(self):
+        """释放当前结果集的预览图和精灵图"""
+        self._stop_animation()
+        self.popup_widgets['image'].configure(image='')
+        self.popup_widgets['grid'].configure(image='')
+        self.photo_references.clear()
+        self.grid_sprite = None
+        self.grid_photo = None
+
+    def _grid_config(self):
+        """网格模式配置"""
+        return self.config['ui'].get('grid', {})
+
+    def _max_popup_results(self):
+        """弹窗最多展示的结果数"""
+        if self._grid_config().get('enabled', False):
+            return self._grid_config().get('max_results', 36)
+        return self.config['features']['search'].get('max_results', 5)
+
+    def _grid_layout(self):
+        """返回网格的 (列数, 格子大小, 间距)"""
+        grid = self._grid_config()
+        columns = max(1, min(grid.get('columns', 6), len(self.popup_memes)))
+        return columns, grid.get('thumb_size', 72), grid.get('spacing', 4)
+
+    def _set_popup_mode(self, mode: str):
+        """在单图模式和网格模式之间切换显示的控件"""
+        self.popup_mode = mode
+        if mode == 'grid':
+            self.popup_widgets['image'].pack_forget()
+            self.popup_widgets['grid'].pack(expand=True)
+        else:
+            self.popup_widgets['grid'].pack_forget()
+            self.popup_widgets['image'].pack(expand=True)
+
+    def _toggle_popup_mode(self):
+        """按 Tab 切换单图/网格模式"""
+        if len(self.popup_memes) > 1:
+            self._set_popup_mode('single' if self.popup_mode == 'grid' else 'grid')
+            self._update_popup_image()
+        return 'break'
+
+    def _get_thumbnail(self, url: str, size: int):
+        """获取缩略图，优先使用缓存"""
+        key = (url, size)
+        thumb = self.thumbnail_cache.get(key)
+        if thumb is None:
+            thumb = make_thumbnail(self._open_image(url), size)
+            self.thumbnail_cache.put(key, thumb)
+        return thumb
+
+    def _build_grid_sprite(self):
+        """把当前结果的缩略图合成为一张精灵图"""
+        columns, cell, spacing = self._grid_layout()
+        thumbs = []
+        for meme in self.popup_memes:
+            try:
+                thumbs.append(self._get_thumbnail(meme['url'], cell))
+            except Exception as e:
+                print(f"加载缩略图失败 {meme['url']}: {e}")
+                thumbs.append(None)
+        
+        self.grid_sprite = compose_sprite(
+            thumbs, columns, cell, spacing,
+            self.config['ui']['window_style']['bg_color']
+        )
+        self.grid_photo = ImageTk.PhotoImage(self.grid_sprite)
+        self.popup_widgets['grid'].configure(image=self.grid_photo)
+
+    def _draw_grid_selection(self):
+        """在精灵图上标出当前选中的格子"""
+        if self.grid_sprite is None:
+            self._build_grid_sprite()
+        columns, cell, spacing = self._grid_layout()
+        self.grid_photo.paste(highlight_cell(
+            self.grid_sprite, self.popup_index, columns, cell, spacing,
+            self.config['ui']['window_style']['accent_color']
+        ))
+
+    def _move_grid_row(self, direction: int):
+        """网格模式下按上下键移动一整行"""
+        if self.popup_mode == 'grid':
+            columns, _, _ = self._grid_layout()
+            self._change_popup_image(direction * columns)
+
+    def _grid_index_at(self, event):
+        """根据鼠标位置计算网格中的结果序号"""
+        columns, cell, spacing = self._grid_layout()
+        return cell_at(event.x, event.y, columns, cell, spacing, len(self.popup_memes))
+
+    def _on_grid_click(self, event):
+        """点击网格中的格子直接发送"""
+        index = self._grid_index_at(event)
+        if index is not None:
+            self.popup_index = index
+            self._send_current_meme()
+
+    def _on_grid_motion(self, event):
+        """鼠标悬停时更新选中格子"""
+        index = self._grid_index_at(event)
+        if index is not None and index != self.popup_index:
+            self.popup_index = index
+            self._update_popup_image()
+
+    def _open_image(self, url: str):
+        """打开图片，优先从图片归档读取，归档中没有时回退到 images 目录"""
+        name = Path(url).name
+        if self.image_pack is not None and name in self.image_pack:
+            try:
+                return self.image_pack.open_image(name)
+            except Exception as e:
+                print(f"从归档读取图片失败 {name}: {e}")
+        return Image.open(url)
+
+    def _load_preview(self, url: str):
+        """解码并缩放预览图，结果放入预览缓存（可在后台线程调用）"""
+        preview_width = self.config['ui']['preview_size']['width']
+        key = (url, preview_width)
+        img = self.preview_cache.get(key)
+        if img is None:
+            img = make_preview(
+                self._open_image(url),
+                preview_width,
+                self.config['ui'].get('preview_quality', 'balanced')
             )
-            name_label.pack()
+            self.preview_cache.put(key, img)
+        return img
+
+    def _get_photo(self, url: str):
+        """按需生成预览 PhotoImage，同一结果集内复用"""
+        if url not in self.photo_references:
+            self.photo_references[url] = ImageTk.PhotoImage(self._load_preview(url))
+        return self.photo_references[url]
+
+    def start_prewarm(self):
+        """启动后台预热，在状态窗口显示之后调用"""
+        prewarm_config = self.config['features'].get('prewarm', {})
+        if not prewarm_config.get('enabled', True) or self.prewarmer is not None:
+            return
+        
+        self.prewarmer = Prewarmer(
+            self._prewarm_image,
+            max_items=prewarm_config.get('max_items', 60),
+            max_bytes=prewarm_config.get('max_mb', 32) * 1024 * 1024,
+            interval=prewarm_config.get('interval', 0.02),
+            idle_delay=prewarm_config.get('idle_delay', 1.0)
+        )
+        self.prewarmer.start(self._prewarm_candidates())
+
+    def _prewarm_candidates(self):
+        """预热顺序：常用的表情包优先，其次是带角色/标签的条目"""
+        names = self.usage_stats.hot(len(self.image_map)) if self.usage_stats else []
+        seen = set(names)
+        for img in self.image_map:
+            if (img.get('author') or img.get('tags')) and img['file_name'] not in seen:
+                names.append(img['file_name'])
+                seen.add(img['file_name'])
+        return [str(self.images_path / name) for name in names]
+
+    def _prewarm_image(self, url: str) -> int:
+        """预热一张图片的预览图（网格模式下同时生成缩略图），返回占用字节数"""
+        img = self._load_preview(url)
+        nbytes = image_nbytes(img)
+        if self._grid_config().get('enabled', False):
+            size = self._grid_config().get('thumb_size', 72)
+            if (url, size) not in self.thumbnail_cache:
+                thumb = make_thumbnail(img.copy(), size)
+                self.thumbnail_cache.put((url, size), thumb)
+                nbytes += image_nbytes(thumb)
+        return nbytes
+
+    def _change_popup_image(self, delta: int):
+        """切换图片"""
+        new_index = self.popup_index + delta
+        if 0 <= new_index < len(self.popup_memes):
+            self.popup_index = new_index
+            self._update_popup_image()
+
+    def _update_popup_image(self):
+        """更新显示的图片"""
+        try:
+            index = self.popup_index
+            total_images = len(self.popup_memes)
+            meme = self.popup_memes[index]
+            widgets = self.popup_widgets
+            self._stop_animation()
             
 
-            score_label = tk.Label(
-                info_frame,
-                bg=self.config['ui']['window_style']['bg_color'],
-                fg=self.config['ui']['window_style']['accent_color'],
-                font=('Microsoft YaHei UI', 9)
-            )
-            score_label.pack()
-            
-            def update_image(index):
-                """更新显示的图片"""
+            if self.popup_mode == 'grid':
+                self._draw_grid_selection()
+            else:
                 try:
-                    meme = memes['urls'][index]
-                    url = meme['url']
-                    
-                    if url in self.photo_references:
-
-                        photo = self.photo_references[url]
-                        image_label.configure(image=photo)
-                        image_label.image = photo
-                        
-
-                        name_label.configure(text=f"{meme['alt']} ({index + 1}/{total_images})")
-                        prev_btn.configure(state=tk.NORMAL if index > 0 else tk.DISABLED)
-                        next_btn.configure(state=tk.NORMAL if index < total_images - 1 else tk.DISABLED)
-                        
-                        score_text = f"匹配度: {meme.get('score', 0)}分"
-                        if 'debug_info' in meme:
-                            score_text += f" (匹配率: {meme['debug_info']['name_match']:.0%})"
-                        score_label.configure(text=score_text)
-                    else:
-                        print(f"错误：图片未预加载 {url}")
-                        
+                    if not self._start_animation(meme['url']):
+                        widgets['image'].configure(image=self._get_photo(meme['url']))
                 except Exception as e:
-                    print(f"更新图片显示失败: {e}")
-                    import traceback
-                    traceback.print_exc()
-            
-
-            image_label.bind('<Button-1>', lambda e: self.send_meme(memes['urls'][current_index.get()]['url'], window))
-            
-
-            window.bind('<Left>', lambda e: change_image(-1))
-            window.bind('<Right>', lambda e: change_image(1))
-            window.bind('<Return>', lambda e: self.send_meme(memes['urls'][current_index.get()]['url'], window))
-            window.bind('<Escape>', lambda e: window.destroy())
+                    print(f"加载图片失败 {meme['url']}: {e}")
+                    widgets['image'].configure(image='')
             
 
-            def on_window_close():
-                self.photo_references.clear()
-                window.destroy()
+            widgets['name'].configure(text=f"{meme['alt']} ({index + 1}/{total_images})")
+            widgets['prev'].configure(state=tk.NORMAL if index > 0 else tk.DISABLED)
+            widgets['next'].configure(state=tk.NORMAL if index < total_images - 1 else tk.DISABLED)
             
-            window.protocol("WM_DELETE_WINDOW", on_window_close)
-            close_btn.bind('<Button-1>', lambda e: on_window_close())
-            
-
-            close_btn.bind('<Button-1>', lambda e: on_window_close())
-            close_btn.bind('<Enter>', lambda e: close_btn.configure(fg='#ff4444'))
-            close_btn.bind('<Leave>', lambda e: close_btn.configure(fg=self.config['ui']['window_style']['text_color']))
-            
-
-            update_image(0)
-            
-
-            def start_move(event):
-                window.x = event.x
-                window.y = event.y
-            
-            def on_motion(event):
-                deltax = event.x - window.x
-                deltay = event.y - window.y
-                x = window.winfo_x() + deltax
-                y = window.winfo_y() + deltay
-                window.geometry(f"+{x}+{y}")
-            
-            title_frame.bind('<Button-1>', start_move)
-            title_frame.bind('<B1-Motion>', on_motion)
-            title_label.bind('<Button-1>', start_move)
-            title_label.bind('<B1-Motion>', on_motion)
-            
-
-            window.update()
-            cursor_x, cursor_y = win32gui.GetCursorPos()
-            window_width = window.winfo_width()
-            window_height = window.winfo_height()
-            screen_width = window.winfo_screenwidth()
-            screen_height = window.winfo_screenheight()
-            
-
-            x = cursor_x + 10
-            y = cursor_y - window_height - 10
-            
-
-            if x + window_width > screen_width:
-                x = cursor_x - window_width - 10
-            
-
-            if y < 0:
-                y = cursor_y + 10
-            
-
-            x = max(0, min(x, screen_width - window_width))
-            y = max(0, min(y, screen_height - window_height))
-            
-            window.geometry(f"+{x}+{y}")
+            score_text = f"匹配度: {meme.get('score', 0)}分"
+            if 'debug_info' in meme:
+                score_text += f" (匹配率: {meme['debug_info']['name_match']:.0%})"
+                if meme['debug_info'].get('usage_bonus'):
+                    score_text += f" +{meme['debug_info']['usage_bonus']}常用"
+            widgets['score'].configure(text=score_text)
             
         except Exception as e:
-            print(f"创建窗口失败: {e}")
+            print(f"更新图片显示失败: {e}")
             import traceback
             traceback.print_exc()
 
-    def send_meme(self, url: str, window: tk.Tk):
+    def _start_animation(self, url: str) -> bool:
+        """如果是动图则开始逐帧播放，返回是否为动图"""
+        animation_config = self.config['ui'].get('animation', {})
+        if (not animation_config.get('enabled', True) or not may_be_animated(url)
+                or self.animated_urls.get(url) is False):
+            return False
+        
+        img = self._open_image(url)
+        self.animated_urls[url] = is_animated(img)
+        if not self.animated_urls[url]:
+            img.close()
+            return False
+        
+        self.animation = FrameStream(
+            img,
+            self.config['ui']['preview_size']['width'],
+            ring_size=animation_config.get('ring_size', 8)
+        )
+        frame, duration = self.animation.next()
+        self.animation_photo = ImageTk.PhotoImage(frame)
+        self.popup_widgets['image'].configure(image=self.animation_photo)
+        self.animation_job = self.root.after(duration, self._animate_step)
+        return True
+
+    def _animate_step(self):
+        """解码下一帧并贴到同一个 PhotoImage 上"""
+        if self.animation is None:
+            return
+        try:
+            frame, duration = self.animation.next()
+            self.animation_photo.paste(frame)
+            self.animation_job = self.root.after(duration, self._animate_step)
+        except Exception as e:
+            print(f"播放动图失败: {e}")
+            self._stop_animation()
+
+    def _stop_animation(self):
+        """停止播放并释放帧缓存，弹窗隐藏后不再占用 CPU"""
+        if self.animation_job is not None:
+            self.root.after_cancel(self.animation_job)
+            self.animation_job = None
+        if self.animation is not None:
+            self.animation.close()
+            self.animation = None
+        self.animation_photo = None
+
+    def _position_popup(self):
+        """将弹窗放到鼠标附近"""
+        window = self.current_window
+        window.update_idletasks()
+        cursor_x, cursor_y = win32gui.GetCursorPos()
+        window_width = window.winfo_reqwidth()
+        window_height = window.winfo_reqheight()
+        screen_width = window.winfo_screenwidth()
+        screen_height = window.winfo_screenheight()
+        
+
+        x = cursor_x + 10
+        y = cursor_y - window_height - 10
+        
+
+        if x + window_width > screen_width:
+            x = cursor_x - window_width - 10
+        
+
+        if y < 0:
+            y = cursor_y + 10
+        
+
+        x = max(0, min(x, screen_width - window_width))
+        y = max(0, min(y, screen_height - window_height))
+        
+        window.geometry(f"+{x}+{y}")
+
+    def _send_current_meme(self):
+        """发送弹窗中当前显示的表情包"""
+        if self.popup_memes:
+            self.send_meme(self.popup_memes[self.popup_index]['url'])
+
+    def send_meme(self, url: str):
         """发送表情包"""
         try:
 
-            img = Image.open(url)
+            img = self._open_image(url)
+            animated = is_animated(img)
             output = BytesIO()
             img.convert('RGB').save(output, 'BMP')
             data = output.getvalue()[14:]
@@ -425,10 +719,13 @@ class MemeSelector:
             win32clipboard.OpenClipboard()
             win32clipboard.EmptyClipboard()
             win32clipboard.SetClipboardData(win32con.CF_DIB, data)
+            # 动图同时以文件形式放入剪贴板，支持的聊天软件会发送完整动图
+            if animated and Path(url).exists():
+                win32clipboard.SetClipboardData(win32con.CF_HDROP, self._drop_files_data(url))
             win32clipboard.CloseClipboard()
             
 
-            window.destroy()
+            self._hide_popup()
             
 
             time.sleep(0.1)
@@ -439,201 +736,494 @@ class MemeSelector:
             time.sleep(0.1)
             keyboard.press_and_release('enter')
             
+
+            if self.usage_stats:
+                try:
+                    self.usage_stats.record(Path(url).name)
+                except Exception as e:
+                    print(f"记录使用统计失败: {e}")
+            
         except Exception as e:
             print(f"发送表情包失败: {e}") 
 
+    @staticmethod
+    def _drop_files_data(path: str) -> bytes:
+        """构造 CF_HDROP 剪贴板数据（DROPFILES 结构 + 以双空字符结尾的宽字符路径列表）"""
+        header = struct.pack('<Iiiii', 20, 0, 0, 0, 1)
+        return header + (str(Path(path).resolve()) + '\0\0').encode('utf-16-le')
+
     def set_running_state(self, state: bool):
         """设置运行状态"""
         self.is_running = state
     
     def on_key(self, event):
-        """按键事件处理"""
+        """按键事件处理（键盘钩子与主进程在同一进程时使用）"""
         if not self.is_running:
             return
             
         try:
             print(f"按键: {event.name}")
+            action = self.key_buffer.feed(event.name)
+            if event.name == 'backspace' or (len(event.name) == 1 and event.name.isalpha()):
+                print(f"拼音缓冲区: {self.key_buffer.pinyin}")
+            self.handle_key_action(action)
             
-            if event.name == 'esc':
-                if self.current_window and self.current_window.winfo_exists():
-                    self.current_window.destroy()
-                self.pinyin_buffer = ""
-                
-            elif event.name == 'backspace':
-                self.pinyin_buffer = self.pinyin_buffer[:-1]
-                print(f"拼音缓冲区: {self.pinyin_buffer}")
-                
-            elif event.name in ['space', 'enter']:
-                if self.pinyin_buffer:
-                    print(f"尝试获取中文文本，拼音: {self.pinyin_buffer}")
-
-                    original_clipboard = None
-                    try:
-                        win32clipboard.OpenClipboard()
-                        if win32clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT):
-                            original_clipboard = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
-                        win32clipboard.CloseClipboard()
-                    except:
-                        pass
-
-
-                    keyboard.send('ctrl+a')
-                    time.sleep(0.1)
-                    keyboard.send('ctrl+c')
-                    time.sleep(0.1)
-                    
-                    try:
-                        win32clipboard.OpenClipboard()
-                        if win32clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT):
-                            text = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
-                            if text and any('\u4e00' <= char <= '\u9fff' for char in text):
-                                print(f"获取到中文文本: {text}")
-                                self.search_memes(text)
-                        win32clipboard.EmptyClipboard()
-                        
-
-                        if original_clipboard:
-                            win32clipboard.SetClipboardData(win32con.CF_UNICODETEXT, original_clipboard)
-                        
-                        win32clipboard.CloseClipboard()
-                    except Exception as e:
-                        print(f"获取剪贴板内容失败: {e}")
-                        try:
-                            win32clipboard.CloseClipboard()
-                        except:
-                            pass
-                    
-                    self.pinyin_buffer = ""
-                    
-            elif len(event.name) == 1:
-                if event.name.isalpha():
-                    self.pinyin_buffer += event.name
-                    print(f"拼音缓冲区: {self.pinyin_buffer}")
-                elif not event.name.isascii():
-                    self.search_memes(event.name)
+            summary = self.latency_probe.record(event.time)
+            if summary is not None:
+                print(LatencyProbe.format(summary))
             
         except Exception as e:
             print(f"按键处理错误: {e}")
 
+    def handle_key_action(self, action):
+        """执行 KeyBuffer 产生的搜索动作"""
+        if not self.is_running or action is None:
+            return
+        
+        if action[0] == 'escape':
+            self.hide_popup()
+        elif action[0] == 'pinyin':
+            # 字母也可能只是在打英文：输入法确认处于中文模式才直接查拼音索引，
+            # 否则仍由剪贴板确认上屏的是中文
+            if not (ime_native_mode() and self.search_pinyin(action[1])):
+                self._search_via_clipboard(action[1])
+        elif action[0] == 'char':
+            self.search_memes(action[1])
+
+    def start_keyboard_process(self):
+        """在独立的子进程中运行全局键盘钩子，搜索动作通过队列转发回来"""
+        self._spawn_key_process()
+        Thread(target=self._consume_key_actions, daemon=True).start()
+
+    def _spawn_key_process(self):
+        """启动（或重启）键盘钩子子进程，每次都换一个新队列"""
+        if self.key_process is not None and self.key_process.is_alive():
+            self.key_process.terminate()
+        
+        context = multiprocessing.get_context('spawn')
+        self.key_queue = context.Queue()
+        self.key_process = context.Process(
+            target=run_hook,
+            args=(self.key_queue,),
+            daemon=True
+        )
+        self.key_process.start()
+        print(f"✓ 键盘钩子进程已启动 (pid {self.key_process.pid})")
+
+    def _consume_key_actions(self):
+        """接收钩子进程发来的动作；子进程意外退出时重启，多次失败后改回进程内钩子"""
+        restarts = 0
+        while True:
+            # 主进程自己也持有队列，子进程死掉时 get() 不会报错，只能超时后检查进程
+            try:
+                action = self.key_queue.get(timeout=self.KEY_PROCESS_POLL)
+            except Empty:
+                if self.key_process.is_alive():
+                    continue
+                action = None
+            except (EOFError, OSError):
+                action = None
+            
+            if action is None:
+                print(f"键盘钩子进程已退出 (退出码 {self.key_process.exitcode})")
+                if restarts >= self.KEY_PROCESS_RESTARTS:
+                    print("键盘钩子进程多次退出，改为在主进程中监听键盘")
+                    keyboard.on_press(self.on_key)
+                    return
+                restarts += 1
+                self._spawn_key_process()
+                continue
+            
+            try:
+                if action[0] == 'latency':
+                    print(LatencyProbe.format(action[1]))
+                else:
+                    self.handle_key_action(action)
+            except Exception as e:
+                print(f"按键处理错误: {e}")
+
+    def _search_via_clipboard(self, buffer: str):
+        """拼音索引没有结果时的后备方案：全选复制输入框内容再搜索"""
+        print(f"尝试获取中文文本，拼音: {buffer}")
+
+        original_clipboard = None
+        try:
+            win32clipboard.OpenClipboard()
+            if win32clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT):
+                original_clipboard = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
+            win32clipboard.CloseClipboard()
+        except:
+            pass
+
+
+        keyboard.send('ctrl+a')
+        time.sleep(0.1)
+        keyboard.send('ctrl+c')
+        time.sleep(0.1)
+        
+        try:
+            win32clipboard.OpenClipboard()
+            if win32clipboard.IsClipboardFormatAvailable(win32con.CF_UNICODETEXT):
+                text = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
+                if text and any('\u4e00' <= char <= '\u9fff' for char in text):
+                    print(f"获取到中文文本: {text}")
+                    self.search_memes(text)
+            win32clipboard.EmptyClipboard()
+            
+
+            if original_clipboard:
+                win32clipboard.SetClipboardData(win32con.CF_UNICODETEXT, original_clipboard)
+            
+            win32clipboard.CloseClipboard()
+        except Exception as e:
+            print(f"获取剪贴板内容失败: {e}")
+            try:
+                win32clipboard.CloseClipboard()
+            except:
+                pass
+
+    def search_pinyin(self, buffer: str) -> bool:
+        """直接用拼音缓冲区在拼音索引中搜索，找到结果返回 True"""
+        if not self.config['features']['search'].get('pinyin', True):
+            return False
+        
+        try:
+            if self.prewarmer:
+                self.prewarmer.notify_activity()
+            print(f"\n拼音搜索: {buffer}")
+            threshold = self.config['features']['search']['score_threshold']
+            
+            with self.index_lock:
+                cache_key = ('pinyin', buffer.lower(), threshold, self.map_version)
+                results = self.result_cache.get(cache_key)
+                if results is not None:
+                    print(f"命中结果缓存 (命中率: {self.result_cache.hit_rate:.0%})")
+                else:
+                    results = []
+                    for index, score in self.pinyin_index.search(buffer):
+                        if score >= threshold:
+                            img = self.image_map[index]
+                            results.append({
+                                'url': str(self.images_path / img['file_name']),
+                                'alt': img['name'],
+                                'score': score,
+                                'debug_info': {
+                                    'name_match': 1.0 if score >= 85 else 0.0,
+                                    'desc_match': 0.0,
+                                    'tags_score': 0
+                                }
+                            })
+                    results = self._top_results(results)
+                    self.result_cache.put(cache_key, results)
+            return self._present_results(results)
+            
+        except Exception as e:
+            print(f"拼音搜索错误: {e}")
+            return False
+
     def search_memes(self, text: str):
         """搜索表情包"""
         if not text.strip():
             return
             
         try:
+            if self.prewarmer:
+                self.prewarmer.notify_activity()
             print(f"\n开始搜索: {text}")
-            results = []
             
 
-            search_text_simp = self.t2s.convert(text.lower())
-            search_text_trad = self.s2t.convert(text.lower())
-            print(f"搜索文本: 简体「{search_text_simp}」繁体「{search_text_trad}」")
+            threshold = self.config['features']['search']['score_threshold']
             
 
-            search_words_simp = set(search_text_simp)
-            search_words_trad = set(search_text_trad)
+            with self.index_lock:
+                # 打分用的就是缓存键里的字符串，首尾空白和繁简写法不同的查询结果完全一致
+                query = self._normalize_query(text)
+                cache_key = ('text', query, threshold, self.map_version)
+                results = self.result_cache.get(cache_key)
+                if results is not None:
+                    print(f"命中结果缓存 (命中率: {self.result_cache.hit_rate:.0%})")
+                else:
+                    results = self._top_results(self._search_text(query))
+                    self.result_cache.put(cache_key, results)
+            self._present_results(results)
             
-            for img in self.image_map:
-                score = 0
-                name = img['name'].lower()
-                name_simp = self.t2s.convert(name)
-                name_trad = self.s2t.convert(name)
-                
-                desc = img.get('description', '').lower()
-                desc_simp = self.t2s.convert(desc)
-                desc_trad = self.s2t.convert(desc)
-                
+        except Exception as e:
+            print(f"搜索错误: {e}")
+            import traceback
+            traceback.print_exc()
 
-                if any(search_text in text for search_text, text in [
-                    (search_text_simp, name_simp),
-                    (search_text_simp, desc_simp),
-                    (search_text_trad, name_trad),
-                    (search_text_trad, desc_trad)
-                ]):
-                    score = 100
+    def _search_text(self, text: str):
+        """解析筛选条件后打分，调用方需持有 index_lock"""
+        # 名称多为「角色：台詞」，描述里也常有「出自第11集」，原文本身能子串命中时
+        # 角色前缀和集数都按原文搜索，不当作筛选条件
+        literal = self._has_substring_hit(text)
+        facet_mask, query_text = self.facet_index.parse(
+            text.lower(), people=not literal, episodes=not literal
+        )
+        if facet_mask is None:
+            return self._score_query(text)
+        
+        allowed = set(FacetIndex.ids(facet_mask))
+        print(f"筛选条件命中 {len(allowed)} 个表情包，关键词「{query_text}」")
+        if query_text:
+            results = self._score_query(query_text, allowed)
+        else:
+            results = self._facet_results(allowed)
+        
+
+        # 名称本身带冒号（如「愛音:蛤」）时按原文再搜一次
+        if not results:
+            results = self._score_query(text)
+        return results
+
+    def _has_substring_hit(self, text: str) -> bool:
+        """原文（简繁任一形式）是否是某个条目名称或描述的子串"""
+        text = text.strip().lower()
+        return bool(
+            self.ngram_index.find_substring(self.t2s.convert(text)) or
+            self.ngram_index.find_substring(self.s2t.convert(text))
+        )
+
+    def _normalize_query(self, text: str) -> str:
+        """把查询统一成去掉首尾空白的小写简体，既用于打分也作为结果缓存的键（转换结果本身也缓存）"""
+        key = text.strip().lower()
+        normalized = self.query_cache.get(key)
+        if normalized is None:
+            normalized = self.t2s.convert(key)
+            self.query_cache.put(key, normalized)
+        return normalized
+
+    def _top_results(self, results):
+        """去重后只保留按匹配分排名靠前的结果，用于缓存"""
+        unique_results = {}
+        for result in results:
+            url = result['url']
+            if url not in unique_results or result['score'] > unique_results[url]['score']:
+                unique_results[url] = result
+        results = sorted(unique_results.values(), key=lambda x: (-x['score'], x['alt']))
+        return results[:max(self.result_cache_top_k, self._max_popup_results())]
+
+    def cache_stats(self) -> dict:
+        """结果缓存的统计信息，便于调整缓存大小"""
+        return dict(self.result_cache.stats(), map_version=self.map_version)
+
+    def reload_image_map(self):
+        """重新加载图片映射并重建索引，版本号变化后旧的搜索缓存全部失效"""
+        indexes = self._build_indexes(self.load_image_map())
+        with self.index_lock:
+            self._swap_indexes(indexes)
+            self.result_cache.clear()
+        print(f"✓ 重新加载了 {len(self.image_map)} 个图片映射 (版本 {self.map_version})")
+
+    def _facet_results(self, allowed):
+        """只有筛选条件没有关键词时，返回全部符合条件的表情包"""
+        results = []
+        for index in sorted(allowed):
+            img = self.image_map[index]
+            results.append({
+                'url': str(self.images_path / img['file_name']),
+                'alt': img['name'],
+                'score': 100,
+                'debug_info': {'name_match': 1.0, 'desc_match': 0.0, 'tags_score': 0}
+            })
+        return results
+
+    def _score_query(self, text: str, allowed=None):
+        """对关键词打分，allowed 不为 None 时只考虑其中的条目"""
+        results = []
+        if not text.strip():
+            return results
+        
+
+        search_text_simp = self.t2s.convert(text.lower())
+        search_text_trad = self.s2t.convert(text.lower())
+        print(f"搜索文本: 简体「{search_text_simp}」繁体「{search_text_trad}」")
+        
+
+        search_chars = set(search_text_simp) | set(search_text_trad)
+        threshold = self.config['features']['search']['score_threshold']
+        
+
+        # 子串命中直接得 100 分，候选由 bigram 倒排表给出
+        exact_ids = (
+            self.ngram_index.find_substring(search_text_simp) |
+            self.ngram_index.find_substring(search_text_trad)
+        )
+        
+
+        # 输入法选错一两个字时按编辑距离容错匹配名称
+        fuzzy_ids = {}
+        if self.config['features']['search'].get('fuzzy_match', False):
+            fuzzy_ids = self.fuzzy_matcher.search(search_text_simp)
+        
+
+        # TF-IDF 模式下用一次稀疏矩阵乘法得到所有条目的余弦相似度
+        similarity = None
+        if self.tfidf_index is not None and self.tfidf_index.available:
+            similarity = self.tfidf_index.similarity(search_text_simp)
+        
+
+        # 一个字都不重合的条目最多只能拿到长度相同的 10 分加成
+        if threshold <= 10:
+            candidate_ids = set(range(len(self.search_entries)))
+        elif similarity is not None:
+            candidate_ids = exact_ids | fuzzy_ids.keys() | similarity.keys()
+        else:
+            candidate_ids = (
+                exact_ids | fuzzy_ids.keys() |
+                self.ngram_index.containing_any(search_chars)
+            )
+        
+        if allowed is not None:
+            candidate_ids &= allowed
+        
+        for index in sorted(candidate_ids):
+            entry = self.search_entries[index]
+            name_simp = entry['name_simp']
+            name_match, desc_match, tags_score = 1.0, 0.0, 0
+            
+            if index in exact_ids:
+                score = 100
+            
+            elif similarity is not None:
+                # 余弦值普遍偏低，开平方后再和原有的分数阈值比较，排序不变
+                name_match = similarity.get(index, 0.0)
+                score = min(99, int(100 * name_match ** 0.5))
+            
+            else:
+                name_match = len(search_chars & entry['name_chars']) / len(search_chars)
+                name_score = int(60 * name_match)
                 
 
-                elif len(search_text_simp) > 1 and (
-                    search_text_simp in name_simp or 
-                    search_text_simp in desc_simp or
-                    search_text_trad in name_trad or 
-                    search_text_trad in desc_trad
-                ):
-                    score = 80
+                desc_match = len(search_chars & entry['desc_chars']) / len(search_chars)
+                desc_score = int(40 * desc_match)
                 
 
-                else:
-
-                    name_chars = set(name_simp + name_trad)
-                    desc_chars = set(desc_simp + desc_trad)
-                    search_chars = search_words_simp | search_words_trad
-                    
-
-                    name_match = len(search_chars & name_chars) / len(search_chars)
-                    name_score = int(60 * name_match)
-                    
-
-                    desc_match = len(search_chars & desc_chars) / len(search_chars)
-                    desc_score = int(40 * desc_match)
-                    
-
-                    tags_score = 0
-                    if 'tags' in img:
-                        tags = set(''.join(self.t2s.convert(tag.lower()) for tag in img['tags']))
-                        tag_match = len(search_chars & tags) / len(search_chars)
-                        tags_score = int(20 * tag_match)
-                    
-                    score = name_score + desc_score + tags_score
+                if entry['tag_chars']:
+                    tag_match = len(search_chars & entry['tag_chars']) / len(search_chars)
+                    tags_score = int(20 * tag_match)
                 
+                score = name_score + desc_score + tags_score
+            
+            if index in fuzzy_ids and index not in exact_ids:
+                score = max(score, 95 - 10 * fuzzy_ids[index])
+            
 
-                if len(search_text_simp) == len(name_simp):
-                    score += 10
-                    
-
-                if search_text_simp in name_simp[:len(search_text_simp)]:
-                    score += 5
+            if len(search_text_simp) == len(name_simp):
+                score += 10
                 
 
-                if score >= self.config['features']['search']['score_threshold']:
-                    results.append({
-                        'url': str(self.images_path / img['file_name']),
-                        'alt': img['name'],
-                        'score': score,
-                        'debug_info': {
-                            'name_match': name_match if 'name_match' in locals() else 1.0,
-                            'desc_match': desc_match if 'desc_match' in locals() else 0.0,
-                            'tags_score': tags_score if 'tags_score' in locals() else 0
-                        }
-                    })
-            
-
-            unique_results = {}
-            for result in results:
-                url = result['url']
-                if url not in unique_results or result['score'] > unique_results[url]['score']:
-                    unique_results[url] = result
-            
-            results = list(unique_results.values())
-            results.sort(key=lambda x: (-x['score'], x['alt']))  # 按分数降序，相同分数按名称排序
-            
-            print(f"找到 {len(results)} 个匹配结果")
-            if results:
-                print("排名前三的匹配：")
-                for i, r in enumerate(results[:3], 1):
-                    print(f"{i}. {r['alt']} (分数: {r['score']}, "
-                          f"匹配率: {r['debug_info']['name_match']:.0%})")
-            
-            if results:
-                if self.current_window and self.current_window.winfo_exists():
-                    self.current_window.destroy()
-                self.create_popup({'urls': results[:5]})
-            else:
-                print("未找到匹配的表情包")
+            if search_text_simp in name_simp[:len(search_text_simp)]:
+                score += 5
             
-        except Exception as e:
-            print(f"搜索错误: {e}")
-            import traceback
-            traceback.print_exc()
+
+            if score >= threshold:
+                img = self.image_map[index]
+                results.append({
+                    'url': str(self.images_path / img['file_name']),
+                    'alt': img['name'],
+                    'score': score,
+                    'debug_info': {
+                        'name_match': name_match,
+                        'desc_match': desc_match,
+                        'tags_score': tags_score,
+                        'fuzzy_distance': fuzzy_ids.get(index)
+                    }
+                })
+        return results
+
+    def _present_results(self, results) -> bool:
+        """按综合分排序并弹出结果（results 已由 _top_results 去重），有结果时返回 True"""
+        results = list(results)
+        self._apply_usage_ranking(results)
+        results.sort(key=lambda x: (-x['rank'], x['alt']))  # 按综合分降序，相同分数按名称排序
+        
+        print(f"找到 {len(results)} 个匹配结果")
+        if results:
+            print("排名前三的匹配：")
+            for i, r in enumerate(results[:3], 1):
+                print(f"{i}. {r['alt']} (分数: {r['score']}, "
+                      f"匹配率: {r['debug_info']['name_match']:.0%})")
+        
+        if results:
+            self.create_popup({'urls': results[:self._max_popup_results()]})
+            return True
+        print("未找到匹配的表情包")
+        return False
+
+    def _apply_usage_ranking(self, results):
+        """把发送热度（按时间衰减）融入排序分，常用的表情包排在前面"""
+        weight = self.config['features'].get('usage', {}).get('weight', 20)
+        heat = self.usage_stats.scores() if self.usage_stats else {}
+        for result in results:
+            bonus = int(round(weight * (1 - 0.5 ** heat.get(Path(result['url']).name, 0.0))))
+            result['debug_info']['usage_bonus'] = bonus
+            result['rank'] = result['score'] + bonus
+
+    def _build_indexes(self, image_map):
+        """根据 image_map 构建全部搜索索引，只放在局部变量里，由 _swap_indexes 一次性替换"""
+        search_entries = []
+        for img in image_map:
+            name = img['name'].lower()
+            desc = img.get('description', '').lower()
+            entry = {
+                'name_simp': self.t2s.convert(name),
+                'name_trad': self.s2t.convert(name),
+                'desc_simp': self.t2s.convert(desc),
+                'desc_trad': self.s2t.convert(desc),
+                'tag_chars': set(''.join(self.t2s.convert(tag.lower()) for tag in img.get('tags', [])))
+            }
+            entry['name_chars'] = set(entry['name_simp'] + entry['name_trad'])
+            entry['desc_chars'] = set(entry['desc_simp'] + entry['desc_trad'])
+            search_entries.append(entry)
+        
+        ngram_index = NgramIndex(
+            [
+                [entry['name_simp'], entry['desc_simp'], entry['name_trad'], entry['desc_trad']]
+                for entry in search_entries
+            ],
+            extra=[[''.join(entry['tag_chars'])] for entry in search_entries]
+        )
+        tfidf_index = None
+        if self.config['features']['search'].get('ranking', 'overlap') == 'tfidf':
+            tfidf_index = TfidfIndex([
+                [
+                    (entry['name_simp'], 2.0),
+                    (entry['desc_simp'], 1.0),
+                    (' '.join(self.t2s.convert(tag.lower()) for tag in img.get('tags', [])), 1.0)
+                ]
+                for img, entry in zip(image_map, search_entries)
+            ])
+        
+        facet_index = FacetIndex(
+            image_map,
+            lambda value: self.t2s.convert(value.lower())
+        )
+        fuzzy_matcher = FuzzyMatcher(
+            [[entry['name_simp'], entry['name_trad']] for entry in search_entries],
+            max_distance=self.config['features']['search'].get('fuzzy_max_distance', 2)
+        )
+        
+        pinyin_index = PinyinIndex([img['name'] for img in image_map])
+        
+        return {
+            'image_map': image_map,
+            'search_entries': search_entries,
+            'ngram_index': ngram_index,
+            'tfidf_index': tfidf_index,
+            'facet_index': facet_index,
+            'fuzzy_matcher': fuzzy_matcher,
+            'pinyin_index': pinyin_index
+        }
+
+    def _swap_indexes(self, indexes):
+        """替换图片映射和全部索引后再更新版本号，旧的搜索缓存随之失效
+
+        初始化之后调用时需持有 index_lock；搜索全程持有同一把锁，所以不会看到新旧混合的索引。
+        """
+        for name, value in indexes.items():
+            setattr(self, name, value)
+        self.map_version += 1
 
     def load_image_map(self):
         """加载图片映射文件"""
@@ -83,6 +83,15 @@ class StatusWindow:
             check_btn.pack(pady=(5, 0))
             
 
+            reload_btn = ttk.Button(
+                status_frame,
+                text="重新加载表情",
+                command=self._on_reload,
+                width=12
+            )
+            reload_btn.pack(pady=(5, 0))
+            
+
             tips_frame = ttk.LabelFrame(
                 main_frame,
                 text="使用说明",
@@ -105,6 +114,7 @@ class StatusWindow:
             tips_label.pack(pady=2)
             
             self.on_switch_change = None
+            self.on_reload = None
             
 
             self.root.protocol("WM_DELETE_WINDOW", self.quit_app)
@@ -127,6 +137,10 @@ class StatusWindow:
         if self.on_switch_change:
             self.on_switch_change(self.is_running.get())
     
+    def _on_reload(self):
+        if self.on_reload:
+            self.on_reload()
+    
     def minimize_to_tray(self):
         """最小化到托盘而不是关闭"""
         self.root.iconify()  
@@ -144,6 +158,10 @@ class StatusWindow:
         """设置回调函数"""
         self.on_switch_change = callback 
     
+    def set_reload_callback(self, callback):
+        """设置重新加载图片映射的回调函数"""
+        self.on_reload = callback
+    
     def check_all(self):
         """检查所有环境状态"""
         self.check_dependencies()
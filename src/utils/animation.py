@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Tuple
+from PIL import Image
+from .preview import preview_size
+
+# 可能包含多帧的格式，其他格式不需要打开文件检查
+ANIMATED_SUFFIXES = {'.gif', '.webp', '.png'}
+
+def is_animated(img: Image.Image) -> bool:
+    return getattr(img, 'is_animated', False) and getattr(img, 'n_frames', 1) > 1
+
+def may_be_animated(url: str) -> bool:
+    return Path(url).suffix.lower() in ANIMATED_SUFFIXES
+
+class FrameStream:
+    """动图的惰性帧序列
+
+    只在需要显示时才 seek 解码下一帧并缩放到预览尺寸，最近 ring_size 帧
+    保存在环形缓存中，内存占用与动图长度无关。
+    """
+    DEFAULT_DURATION = 100
+
+    def __init__(self, img: Image.Image, width: int, ring_size: int = 8):
+        self.img = img
+        self.n_frames = getattr(img, 'n_frames', 1)
+        self.size = preview_size(img.size, width)
+        self.ring_size = ring_size
+        self.index = 0
+        self._ring = OrderedDict()
+
+    def frame(self, index: int) -> Tuple[Image.Image, int]:
+        """返回 (缩放后的帧, 持续毫秒数)"""
+        if index in self._ring:
+            return self._ring[index]
+        
+        self.img.seek(index)
+        duration = self.img.info.get('duration') or self.DEFAULT_DURATION
+        frame = self.img.convert('RGBA').resize(self.size, Image.Resampling.BILINEAR)
+        
+        self._ring[index] = (frame, duration)
+        while len(self._ring) > self.ring_size:
+            self._ring.popitem(last=False)
+        return frame, duration
+
+    def next(self) -> Tuple[Image.Image, int]:
+        """返回下一帧，播放到最后一帧后从头循环"""
+        result = self.frame(self.index)
+        self.index = (self.index + 1) % self.n_frames
+        return result
+
+    def close(self):
+        self._ring.clear()
+        self.img.close()
@@ -0,0 +1,62 @@
+import re
+from typing import Callable, Iterator, List, Optional, Tuple
+
+class FacetIndex:
+    """角色（作者/标签）和集数的位图索引
+
+    每个取值对应一个 Python int 位集，第 i 位表示第 i 个条目。查询里的
+    「愛音:」前缀或「ep11」「第11集」会被解析为位集，先求交集再打分。
+    """
+    PERSON_PATTERN = re.compile(r'^\s*([^:：\s]+)\s*[:：]\s*')
+    EPISODE_PATTERN = re.compile(r'(?<![a-z])ep\s*(\d+)|第\s*(\d+)\s*集', re.IGNORECASE)
+
+    def __init__(self, image_map: List[dict], normalize: Callable[[str], str]):
+        self.normalize = normalize
+        self.people = {}
+        self.episodes = {}
+        for index, img in enumerate(image_map):
+            bit = 1 << index
+            names = set(img.get('tags', []))
+            if img.get('author'):
+                names.add(img['author'])
+            for name in names:
+                key = normalize(name)
+                self.people[key] = self.people.get(key, 0) | bit
+            
+            # 未标注集数的条目写的是 episode: 0，不能让「ep0」筛出所有未标注的表情包
+            try:
+                episode = int(img.get('episode') or 0)
+            except (TypeError, ValueError):
+                continue
+            if episode > 0:
+                self.episodes[episode] = self.episodes.get(episode, 0) | bit
+
+    def parse(self, query: str, people: bool = True, episodes: bool = True) -> Tuple[Optional[int], str]:
+        """解析筛选条件，返回 (位集, 剩余关键词)；没有筛选条件时位集为 None
+
+        people / episodes 为 False 时不解析角色前缀 / 集数，由调用方决定这段文字
+        是筛选条件还是名称、描述原文的一部分。
+        """
+        mask = None
+        rest = query
+        
+        match = self.PERSON_PATTERN.match(rest) if people else None
+        if match and self.normalize(match.group(1)) in self.people:
+            mask = self.people[self.normalize(match.group(1))]
+            rest = rest[match.end():]
+        
+        match = self.EPISODE_PATTERN.search(rest) if episodes else None
+        if match:
+            episode_mask = self.episodes.get(int(match.group(1) or match.group(2)), 0)
+            mask = episode_mask if mask is None else mask & episode_mask
+            rest = rest[:match.start()] + rest[match.end():]
+        
+        return mask, rest.strip()
+
+    @staticmethod
+    def ids(mask: int) -> Iterator[int]:
+        """遍历位集中为 1 的位"""
+        while mask:
+            lowest = mask & -mask
+            yield lowest.bit_length() - 1
+            mask ^= lowest
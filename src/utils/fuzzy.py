@@ -0,0 +1,63 @@
+from typing import Dict, List
+from .ngram_index import NgramIndex
+
+def bounded_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """计算编辑距离，超过 max_distance 时提前返回 max_distance + 1"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if len(a) > len(b):
+        a, b = b, a
+    
+    previous = list(range(len(a) + 1))
+    for j, char_b in enumerate(b, 1):
+        # 只计算对角线附近宽度为 2 * max_distance + 1 的带，带外视为超限
+        current = [j] + [max_distance + 1] * len(a)
+        low = max(1, j - max_distance)
+        high = min(len(a), j + max_distance)
+        for i in range(low, high + 1):
+            current[i] = min(
+                previous[i] + 1,
+                current[i - 1] + 1,
+                previous[i - 1] + (a[i - 1] != char_b)
+            )
+        if min(current[low - 1:high + 1]) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous[len(a)], max_distance + 1)
+
+class FuzzyMatcher:
+    """容错匹配：bigram 倒排表生成候选，再用有界编辑距离验证
+
+    k 个错字最多破坏 2k 个 bigram，所以候选至少要与查询共享
+    (bigram 数 - 2k) 个 bigram，只需检查少量候选而不是整个列表。
+    """
+    MIN_QUERY_LENGTH = 3
+
+    def __init__(self, names: List[List[str]], max_distance: int = 2):
+        self.max_distance = max_distance
+        self.index = NgramIndex(names)
+
+    def distance_limit(self, query: str) -> int:
+        """查询越长允许的错字越多，短查询只允许一个"""
+        return min(self.max_distance, max(1, len(query) // 4))
+
+    def search(self, query: str) -> Dict[int, int]:
+        """返回 {条目序号: 编辑距离}"""
+        if len(query) < self.MIN_QUERY_LENGTH or self.max_distance <= 0:
+            return {}
+        
+        limit = self.distance_limit(query)
+        gram_count = len(set(NgramIndex._bigrams(query)))
+        required = max(1, gram_count - 2 * limit)
+        
+        matches = {}
+        for doc_id, shared in self.index.shared_bigrams(query).items():
+            if shared < required:
+                continue
+            distance = min(
+                bounded_levenshtein(query, name, limit)
+                for name in self.index.documents[doc_id]
+            )
+            if distance <= limit:
+                matches[doc_id] = distance
+        return matches
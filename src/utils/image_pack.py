@@ -0,0 +1,127 @@
+import io
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Optional
+from PIL import Image
+
+class MemoryReader(io.RawIOBase):
+    """只读的类文件对象，按需从 memoryview 切片读取
+
+    打开图片时不会先把整个文件读成 bytes。read() 仍要返回 bytes，只复制请求的那一段；
+    readinto() 把切片直接写进调用方的缓冲区，不经过中间的 bytes 对象。
+    """
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(len(self._view), self._pos + size)
+        data = self._view[self._pos:end].tobytes()
+        self._pos = end
+        return data
+
+    def readinto(self, buffer) -> int:
+        target = memoryview(buffer).cast('B')
+        end = min(len(self._view), self._pos + len(target))
+        count = max(0, end - self._pos)
+        target[:count] = self._view[self._pos:self._pos + count]
+        self._pos += count
+        return count
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+class ImagePack:
+    """单文件图片归档
+
+    images.pack 顺序存放所有图片的原始字节，images.pack.json 记录每个文件的
+    偏移、长度和打包时的修改时间。归档通过 mmap 映射，打开图片时不需要逐个
+    open/stat 文件。由 scripts/build_pack.py 生成。
+    """
+    def __init__(self, pack_path: Path, index: dict):
+        self.pack_path = Path(pack_path)
+        self.index = index
+        self._file = open(self.pack_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+    @classmethod
+    def open(cls, pack_path: Path, images_dir: Optional[Path] = None) -> Optional['ImagePack']:
+        """打开归档，不存在或损坏时返回 None（调用方回退到 images 目录）
+
+        给出 images_dir 时扫描一次目录，修改时间和打包时不同的图片视为不在归档里，
+        改读 images 目录中编辑过的文件。
+        """
+        pack_path = Path(pack_path)
+        index_path = index_path_for(pack_path)
+        if not pack_path.exists() or not index_path.exists():
+            return None
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)['files']
+            
+            if images_dir is not None:
+                stale = stale_entries(index, Path(images_dir))
+                for name in stale:
+                    del index[name]
+                if stale:
+                    print(f"归档中有 {len(stale)} 张图片已在图片目录中修改，改为直接读取文件")
+            
+            pack = cls(pack_path, index)
+            print(f"✓ 加载图片归档: {pack_path} ({len(index)} 张图片)")
+            return pack
+        except Exception as e:
+            print(f"加载图片归档失败，改用图片目录: {e}")
+            return None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def read(self, name: str) -> memoryview:
+        """返回图片原始字节的零拷贝视图"""
+        offset, length = self.index[name][:2]
+        return self._view[offset:offset + length]
+
+    def open_image(self, name: str) -> Image.Image:
+        return Image.open(MemoryReader(self.read(name)))
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+def stale_entries(index: dict, images_dir: Path) -> list:
+    """图片目录中存在、但修改时间和索引记录不一致的条目"""
+    stale = []
+    try:
+        with os.scandir(images_dir) as entries:
+            for entry in entries:
+                record = index.get(entry.name)
+                if record is not None and len(record) > 2 and entry.stat().st_mtime_ns != record[2]:
+                    stale.append(entry.name)
+    except OSError:
+        pass
+    return stale
+
+def index_path_for(pack_path: Path) -> Path:
+    """归档对应的索引文件路径"""
+    return Path(pack_path).with_name(Path(pack_path).name + '.json')
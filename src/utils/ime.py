@@ -0,0 +1,33 @@
+"""查询前台窗口的输入法状态
+
+拼音缓冲区里的字母也可能只是在打英文，只有输入法处于中文模式时按下空格/回车
+才会上屏中文。这里向前台窗口的默认 IME 窗口发送 WM_IME_CONTROL 查询开关状态
+和转换模式，跨进程也能用。
+"""
+import ctypes
+from typing import Optional
+
+WM_IME_CONTROL = 0x0283
+IMC_GETCONVERSIONMODE = 0x0001
+IMC_GETOPENSTATUS = 0x0005
+IME_CMODE_NATIVE = 0x0001
+
+def ime_native_mode() -> Optional[bool]:
+    """前台输入法处于中文模式返回 True，英文模式或未打开返回 False，无法判断时返回 None"""
+    try:
+        import win32gui
+        imm32 = ctypes.windll.imm32
+        imm32.ImmGetDefaultIMEWnd.argtypes = [ctypes.c_void_p]
+        imm32.ImmGetDefaultIMEWnd.restype = ctypes.c_void_p
+        
+        hwnd = win32gui.GetForegroundWindow()
+        ime_hwnd = imm32.ImmGetDefaultIMEWnd(hwnd) if hwnd else None
+        if not ime_hwnd:
+            return None
+        
+        if not win32gui.SendMessage(ime_hwnd, WM_IME_CONTROL, IMC_GETOPENSTATUS, 0):
+            return False
+        mode = win32gui.SendMessage(ime_hwnd, WM_IME_CONTROL, IMC_GETCONVERSIONMODE, 0)
+        return bool(mode & IME_CMODE_NATIVE)
+    except Exception:
+        return None
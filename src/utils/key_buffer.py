@@ -0,0 +1,59 @@
+import time
+from typing import Optional, Tuple
+
+class KeyBuffer:
+    """把全局按键转换为搜索动作
+
+    返回值: ('escape',)、('pinyin', 拼音缓冲区)、('char', 字符) 或 None。
+    主进程和键盘钩子子进程共用，保证两种运行方式行为一致。
+    """
+    def __init__(self):
+        self.pinyin = ""
+
+    def feed(self, name: str) -> Optional[Tuple[str, ...]]:
+        if name == 'esc':
+            self.pinyin = ""
+            return ('escape',)
+        
+        if name == 'backspace':
+            self.pinyin = self.pinyin[:-1]
+            return None
+        
+        if name in ['space', 'enter']:
+            if self.pinyin:
+                buffer, self.pinyin = self.pinyin, ""
+                return ('pinyin', buffer)
+            return None
+        
+        if len(name) == 1:
+            if name.isalpha():
+                self.pinyin += name
+            elif not name.isascii():
+                return ('char', name)
+        return None
+
+class LatencyProbe:
+    """统计按键事件从钩子产生到回调处理完的延迟"""
+    def __init__(self, report_every: int = 200):
+        self.report_every = report_every
+        self.samples = []
+
+    def record(self, event_time: float) -> Optional[dict]:
+        """记录一次延迟，攒够 report_every 次后返回统计结果"""
+        self.samples.append((time.time() - event_time) * 1000)
+        if len(self.samples) < self.report_every:
+            return None
+        
+        samples = sorted(self.samples)
+        self.samples = []
+        return {
+            'count': len(samples),
+            'p50': samples[len(samples) // 2],
+            'p99': samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+            'max': samples[-1]
+        }
+
+    @staticmethod
+    def format(summary: dict) -> str:
+        return (f"按键延迟 ({summary['count']}次): p50 {summary['p50']:.1f}ms, "
+                f"p99 {summary['p99']:.1f}ms, 最大 {summary['max']:.1f}ms")
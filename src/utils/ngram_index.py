@@ -0,0 +1,71 @@
+from collections import Counter, defaultdict
+from typing import Iterable, List, Optional, Set
+
+class NgramIndex:
+    """字符 unigram/bigram 倒排索引
+
+    documents[i] 是第 i 个条目的若干文本（名称、描述的简繁体），子串查询先用
+    bigram 倒排表求交集得到候选，再逐个验证，耗时与命中数成正比而不是与条目总数成正比。
+    extra[i] 中的文本只参与单字索引（例如标签），不参与子串匹配。
+    """
+    def __init__(self, documents: List[List[str]], extra: Optional[List[List[str]]] = None):
+        self.documents = documents
+        self.unigrams = defaultdict(set)
+        self.bigrams = defaultdict(set)
+        for doc_id, texts in enumerate(documents):
+            for text in texts:
+                for char in text:
+                    self.unigrams[char].add(doc_id)
+                for gram in self._bigrams(text):
+                    self.bigrams[gram].add(doc_id)
+        
+        for doc_id, texts in enumerate(extra or []):
+            for text in texts:
+                for char in text:
+                    self.unigrams[char].add(doc_id)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @staticmethod
+    def _bigrams(text: str) -> List[str]:
+        return [text[i:i + 2] for i in range(len(text) - 1)]
+
+    def candidates(self, query: str) -> Set[int]:
+        """可能包含 query 的条目（未验证）"""
+        if not query:
+            return set()
+        if len(query) == 1:
+            return set(self.unigrams.get(query, ()))
+        
+        postings = sorted(
+            (self.bigrams.get(gram, set()) for gram in set(self._bigrams(query))),
+            key=len
+        )
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
+
+    def find_substring(self, query: str) -> Set[int]:
+        """名称或描述中包含 query 的条目"""
+        return {
+            doc_id for doc_id in self.candidates(query)
+            if any(query in text for text in self.documents[doc_id])
+        }
+
+    def containing_any(self, chars: Iterable[str]) -> Set[int]:
+        """至少包含 chars 中一个字的条目"""
+        result = set()
+        for char in chars:
+            result |= self.unigrams.get(char, set())
+        return result
+
+    def shared_bigrams(self, query: str) -> Counter:
+        """统计每个条目与 query 共有的 bigram 种数"""
+        counts = Counter()
+        for gram in set(self._bigrams(query)):
+            counts.update(self.bigrams.get(gram, ()))
+        return counts
@@ -0,0 +1,98 @@
+from collections import defaultdict
+from typing import List, Tuple
+from .ngram_index import NgramIndex
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+class PinyinIndex:
+    """表情包名称的拼音索引
+
+    每个条目在加载时预先转换为全拼（如 zhenbuganxiangxin）和首字母
+    （如 zbgxx），输入法的拼音缓冲区可以直接在索引上查找，不需要读剪贴板。
+    完全匹配查哈希表，部分匹配用 NgramIndex 的 bigram 倒排表找候选，
+    只对候选逐个判断匹配方式。部分匹配必须落在音节边界上，
+    angle 不会匹配 zhe-y·ang-le 这种跨音节的片段。
+    """
+    # 短拼音容易误中，只做完全匹配
+    MIN_PARTIAL_LENGTH = 4
+    # 两个字母的首字母缩写（wo、by、sm）和英文单词太容易撞上
+    MIN_INITIALS_LENGTH = 3
+
+    def __init__(self, names: List[str]):
+        self.available = lazy_pinyin is not None
+        self.names_full = []
+        self.names_initials = []
+        self.boundaries = []
+        self.exact = defaultdict(set)
+        self.ngram_index = NgramIndex([])
+        if not self.available:
+            print("警告: 未安装 pypinyin，拼音搜索不可用")
+            return
+
+        for index, name in enumerate(names):
+            syllables = [s for s in lazy_pinyin(name, errors='ignore') if s]
+            full = ''.join(syllables)
+            initials = ''.join(s[0] for s in syllables)
+
+            offsets = {0}
+            for syllable in syllables:
+                offsets.add(max(offsets) + len(syllable))
+
+            self.names_full.append(full)
+            self.names_initials.append(initials)
+            self.boundaries.append(offsets)
+            self.exact[full].add(index)
+            if len(initials) >= self.MIN_INITIALS_LENGTH:
+                self.exact[initials].add(index)
+
+        self.ngram_index = NgramIndex([
+            [full, initials] for full, initials in zip(self.names_full, self.names_initials)
+        ])
+
+    def _aligned_find(self, index: int, query: str) -> int:
+        """query 在全拼中首尾都落在音节边界上的第一个位置，没有时返回 -1"""
+        full = self.names_full[index]
+        offsets = self.boundaries[index]
+        start = full.find(query)
+        while start != -1:
+            if start in offsets and start + len(query) in offsets:
+                return start
+            start = full.find(query, start + 1)
+        return -1
+
+    def search(self, buffer: str) -> List[Tuple[int, int]]:
+        """返回 (条目序号, 分数) 列表"""
+        if not self.available or len(buffer) < 2:
+            return []
+
+        query = buffer.lower()
+        partial = len(query) >= self.MIN_PARTIAL_LENGTH
+        candidates = set(self.exact.get(query, ()))
+        if partial:
+            candidates |= self.ngram_index.find_substring(query)
+
+        matches = []
+        for index in sorted(candidates):
+            full = self.names_full[index]
+            initials = self.names_initials[index]
+            if full == query:
+                score = 100
+            elif initials == query and len(query) >= self.MIN_INITIALS_LENGTH:
+                score = 90
+            elif not partial:
+                continue
+            else:
+                start = self._aligned_find(index, query)
+                if start == 0:
+                    score = 85
+                elif start > 0:
+                    score = 75
+                elif initials.startswith(query):
+                    score = 70
+                else:
+                    continue
+            matches.append((index, score))
+        return matches
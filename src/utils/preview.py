@@ -0,0 +1,26 @@
+from typing import Tuple
+from PIL import Image
+
+# 预览质量档位: (是否使用 JPEG draft 降采样解码, 最终缩放算法)
+QUALITY_PRESETS = {
+    'quality': (False, Image.Resampling.LANCZOS),
+    'balanced': (True, Image.Resampling.LANCZOS),
+    'fast': (True, Image.Resampling.BILINEAR),
+}
+
+def preview_size(size: Tuple[int, int], width: int) -> Tuple[int, int]:
+    """按预览宽度等比例计算预览尺寸"""
+    src_width, src_height = size
+    return width, max(1, int(width / (src_width / src_height)))
+
+def make_preview(img: Image.Image, width: int, quality: str = 'balanced') -> Image.Image:
+    """生成预览图
+
+    JPEG 在 draft 模式下由解码器直接做 DCT 缩放，只解码到不小于目标尺寸的
+    1/2、1/4 或 1/8，再做一次小得多的缩放；其他格式 draft 不生效，按原图缩放。
+    """
+    use_draft, resample = QUALITY_PRESETS.get(quality, QUALITY_PRESETS['balanced'])
+    target = preview_size(img.size, width)
+    if use_draft:
+        img.draft('RGB', target)
+    return img.resize(target, resample)
@@ -0,0 +1,61 @@
+import time
+from threading import Thread
+from typing import Callable, Iterable
+
+class Prewarmer:
+    """低优先级后台预热
+
+    在界面空闲时逐个调用 load(key) 解码最可能被用到的图片，累计占用超过
+    max_bytes 或数量超过 max_items 后停止。每次有用户操作都会调用
+    notify_activity()，预热线程会让出，直到空闲 idle_delay 秒后才继续。
+    """
+    def __init__(self, load: Callable[[str], int], max_items: int = 60,
+                 max_bytes: int = 48 * 1024 * 1024, interval: float = 0.02,
+                 idle_delay: float = 1.0):
+        self.load = load
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.idle_delay = idle_delay
+        self.loaded = 0
+        self.loaded_bytes = 0
+        self.last_activity = 0.0
+        self.stopped = False
+        self.thread = None
+
+    def notify_activity(self):
+        """用户正在搜索或查看弹窗，预热立即让出"""
+        self.last_activity = time.monotonic()
+
+    def start(self, keys: Iterable[str]):
+        self.thread = Thread(target=self._run, args=(list(keys),), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+
+    def _wait_idle(self):
+        while not self.stopped:
+            remaining = self.idle_delay - (time.monotonic() - self.last_activity)
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 0.1))
+
+    def _run(self, keys):
+        started = time.perf_counter()
+        for key in keys:
+            if self.loaded >= self.max_items or self.loaded_bytes >= self.max_bytes:
+                break
+            self._wait_idle()
+            if self.stopped:
+                break
+            try:
+                self.loaded_bytes += self.load(key)
+                self.loaded += 1
+            except Exception as e:
+                print(f"预热图片失败 {key}: {e}")
+            time.sleep(self.interval)
+        
+        print(f"预热完成: {self.loaded} 张图片, "
+              f"{self.loaded_bytes / 1024 / 1024:.1f}MB, "
+              f"耗时 {time.perf_counter() - started:.1f}秒")
@@ -0,0 +1,101 @@
+import math
+from collections import Counter
+from typing import Dict, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+class TfidfIndex:
+    """字符 n-gram 的 TF-IDF 向量索引
+
+    每个条目的名称、描述和标签按字段权重合成一个 TF-IDF 向量（单字 + 双字，
+    L2 归一化），按列（term）压缩存储为 CSC 稀疏矩阵。查询时把查询向量与矩阵
+    相乘一次得到所有条目的余弦相似度，「的」「我」这类常见字的 IDF 很低，
+    不会再抬高无关条目的分数。需要 numpy。
+    """
+    def __init__(self, documents: List[List[Tuple[str, float]]]):
+        self.available = np is not None
+        self.size = len(documents)
+        self.vocab = {}
+        self.idf = None
+        if not self.available:
+            print("警告: 未安装 numpy，TF-IDF 排序不可用")
+            return
+        
+        doc_terms = []
+        doc_freq = Counter()
+        for fields in documents:
+            counts = Counter()
+            for text, weight in fields:
+                for term in self.terms(text):
+                    counts[term] += weight
+            doc_terms.append(counts)
+            doc_freq.update(counts.keys())
+        
+        for term in doc_freq:
+            self.vocab[term] = len(self.vocab)
+        self.idf = np.ones(len(self.vocab), dtype=np.float32)
+        for term, column in self.vocab.items():
+            self.idf[column] = math.log((1 + self.size) / (1 + doc_freq[term])) + 1
+        
+
+        columns = [[] for _ in self.vocab]
+        for doc_id, counts in enumerate(doc_terms):
+            weights = {
+                self.vocab[term]: (1 + math.log(count)) * self.idf[self.vocab[term]]
+                for term, count in counts.items()
+            }
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for column, weight in weights.items():
+                columns[column].append((doc_id, weight / norm))
+        
+        self.indptr = np.zeros(len(columns) + 1, dtype=np.int64)
+        self.indptr[1:] = np.cumsum([len(column) for column in columns])
+        self.indices = np.fromiter(
+            (doc_id for column in columns for doc_id, _ in column),
+            dtype=np.int32, count=int(self.indptr[-1])
+        )
+        self.data = np.fromiter(
+            (weight for column in columns for _, weight in column),
+            dtype=np.float32, count=int(self.indptr[-1])
+        )
+
+    @staticmethod
+    def terms(text: str) -> List[str]:
+        """单字和相邻双字，双字只在空白分隔的同一段内组合，不跨标签或词的边界"""
+        terms = []
+        for token in text.split():
+            terms.extend(token)
+            terms.extend(a + b for a, b in zip(token, token[1:]))
+        return terms
+
+    def similarity(self, query: str) -> Dict[int, float]:
+        """返回 {条目序号: 余弦相似度}，只包含相似度大于 0 的条目"""
+        if not self.available:
+            return {}
+        
+        counts = Counter(term for term in self.terms(query) if term in self.vocab)
+        if not counts:
+            return {}
+        
+        columns = [self.vocab[term] for term in counts]
+        weights = np.array(
+            [(1 + math.log(counts[term])) * self.idf[self.vocab[term]] for term in counts],
+            dtype=np.float32
+        )
+        weights /= np.linalg.norm(weights)
+        
+
+        # 稀疏矩阵乘向量：把查询涉及的列拼接起来按条目序号累加
+        starts = self.indptr[columns]
+        ends = self.indptr[np.array(columns) + 1]
+        rows = np.concatenate([self.indices[s:e] for s, e in zip(starts, ends)])
+        values = np.concatenate([
+            self.data[s:e] * w for s, e, w in zip(starts, ends, weights)
+        ])
+        scores = np.bincount(rows, weights=values, minlength=self.size)
+        
+        hits = np.nonzero(scores > 0)[0]
+        return dict(zip(hits.tolist(), scores[hits].tolist()))
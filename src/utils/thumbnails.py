@@ -0,0 +1,60 @@
+from typing import List, Optional, Tuple
+from PIL import Image, ImageDraw
+
+def image_nbytes(img: Image.Image) -> int:
+    """估算图片解码后占用的内存字节数"""
+    return img.width * img.height * len(img.getbands())
+
+def make_thumbnail(img: Image.Image, size: int) -> Image.Image:
+    """生成不超过 size x size 的缩略图（JPEG 会自动使用 draft 降采样解码）"""
+    img.thumbnail((size, size), Image.Resampling.BILINEAR)
+    return img.convert('RGB')
+
+def compose_sprite(thumbs: List[Optional[Image.Image]], columns: int, cell: int,
+                   spacing: int, bg_color: str) -> Image.Image:
+    """把多张缩略图拼成一张精灵图，Tk 只需要持有一个 PhotoImage"""
+    rows = max(1, (len(thumbs) + columns - 1) // columns)
+    width = columns * cell + (columns + 1) * spacing
+    height = rows * cell + (rows + 1) * spacing
+    sprite = Image.new('RGB', (width, height), bg_color)
+    
+    for index, thumb in enumerate(thumbs):
+        if thumb is None:
+            continue
+        left, top, _, _ = cell_box(index, columns, cell, spacing)
+        sprite.paste(thumb, (
+            left + (cell - thumb.width) // 2,
+            top + (cell - thumb.height) // 2
+        ))
+    return sprite
+
+def cell_box(index: int, columns: int, cell: int, spacing: int) -> Tuple[int, int, int, int]:
+    """返回第 index 个格子在精灵图中的区域"""
+    row, column = divmod(index, columns)
+    left = spacing + column * (cell + spacing)
+    top = spacing + row * (cell + spacing)
+    return left, top, left + cell, top + cell
+
+def cell_at(x: int, y: int, columns: int, cell: int, spacing: int, total: int) -> Optional[int]:
+    """根据点击坐标计算格子序号，点在间隙或空白处时返回 None"""
+    column, offset_x = divmod(x - spacing, cell + spacing)
+    row, offset_y = divmod(y - spacing, cell + spacing)
+    if x < spacing or y < spacing or offset_x >= cell or offset_y >= cell:
+        return None
+    if column >= columns:
+        return None
+    index = row * columns + column
+    return index if index < total else None
+
+def highlight_cell(sprite: Image.Image, index: int, columns: int, cell: int,
+                   spacing: int, color: str) -> Image.Image:
+    """返回在选中格子周围画框后的精灵图副本"""
+    img = sprite.copy()
+    left, top, right, bottom = cell_box(index, columns, cell, spacing)
+    border = max(1, spacing // 2)
+    ImageDraw.Draw(img).rectangle(
+        (left - border, top - border, right + border - 1, bottom + border - 1),
+        outline=color,
+        width=border
+    )
+    return img
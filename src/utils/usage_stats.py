@@ -0,0 +1,124 @@
+import json
+import os
+import time
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional
+
+class UsageStats:
+    """表情包发送统计
+
+    每次发送追加一行到日志文件（崩溃最多丢失最后一行），日志行数达到
+    compact_every 后压缩为快照文件。计数按半衰期做时间衰减，首次查询时才加载。
+    """
+    def __init__(self, data_dir: Path, half_life_days: float = 14.0, compact_every: int = 200):
+        self.snapshot_path = Path(data_dir) / 'usage_stats.json'
+        self.log_path = Path(data_dir) / 'usage_stats.log'
+        self.half_life = half_life_days * 86400
+        self.compact_every = compact_every
+        self._stats = None  # file_name -> [衰减后的计数, 最后发送时间, 总次数]
+        self._applied_until = 0.0
+        self._log_lines = 0
+        self._lock = Lock()
+
+    def _decay(self, elapsed: float) -> float:
+        return 0.5 ** (max(0.0, elapsed) / self.half_life)
+
+    def _apply(self, name: str, timestamp: float):
+        count, last, total = self._stats.get(name, (0.0, timestamp, 0))
+        self._stats[name] = [count * self._decay(timestamp - last) + 1, timestamp, total + 1]
+        self._applied_until = max(self._applied_until, timestamp)
+
+    def _ensure_loaded(self):
+        if self._stats is not None:
+            return
+        self._stats = {}
+        
+        if self.snapshot_path.exists():
+            try:
+                with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                    snapshot = json.load(f)
+                self._stats = snapshot.get('stats', {})
+                self._applied_until = snapshot.get('applied_until', 0.0)
+            except Exception as e:
+                print(f"加载使用统计快照失败: {e}")
+        
+
+        if self.log_path.exists():
+            torn = 0
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    # 写入中途崩溃会留下没有换行符的半行，名称可能被截断，直接丢弃
+                    if not line.endswith(b'\n'):
+                        torn = len(line)
+                        continue
+                    try:
+                        timestamp, name = line.decode('utf-8').rstrip('\r\n').split('\t', 1)
+                        timestamp = float(timestamp)
+                    except ValueError:
+                        continue
+                    self._log_lines += 1
+                    # 快照之后的记录才需要回放，避免压缩中途崩溃导致重复计数
+                    if timestamp > self._applied_until:
+                        self._apply(name, timestamp)
+            
+
+            # 截掉半行，之后追加的记录才不会接在它后面
+            if torn:
+                with open(self.log_path, 'r+b') as f:
+                    f.truncate(f.seek(0, os.SEEK_END) - torn)
+        
+        print(f"✓ 加载了 {len(self._stats)} 条使用统计")
+
+    def record(self, name: str, timestamp: Optional[float] = None):
+        """记录一次发送"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            self._ensure_loaded()
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(f"{timestamp!r}\t{name}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(name, timestamp)
+            self._log_lines += 1
+            if self._log_lines >= self.compact_every:
+                self._compact()
+
+    def _compact(self):
+        """把当前统计写成快照并清空日志"""
+        tmp_path = self.snapshot_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'applied_until': self._applied_until,
+                'stats': self._stats
+            }, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        open(self.log_path, 'w', encoding='utf-8').close()
+        self._log_lines = 0
+
+    def score(self, name: str, now: Optional[float] = None) -> float:
+        """返回按时间衰减后的发送热度"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._ensure_loaded()
+            if name not in self._stats:
+                return 0.0
+            count, last, _ = self._stats[name]
+            return count * self._decay(now - last)
+
+    def scores(self, now: Optional[float] = None) -> Dict[str, float]:
+        """返回全部表情包的热度"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                name: count * self._decay(now - last)
+                for name, (count, last, _) in self._stats.items()
+            }
+
+    def hot(self, limit: int) -> List[str]:
+        """返回最热门的表情包文件名"""
+        scores = self.scores()
+        return sorted(scores, key=scores.get, reverse=True)[:limit]